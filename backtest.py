@@ -0,0 +1,240 @@
+"""
+Backtest vectorisé de la règle de paire N/N+1 sur un historique de jeux.
+
+L'historique est encodé en tableaux NumPy indexés par numéro de jeu (masque
+4 bits du premier groupe, voir SUIT_BITS, et présence du jeu). Chaque
+variante (mapping, décalage de la cible N+1+offset, décalage du backup) est
+évaluée sur tout l'historique en opérations de tableaux : la prédiction est
+une lecture de la LUT de 16 entrées, la vérification en 2 chances un ET
+binaire sur le tableau décalé de `offset` et `offset + 1`, et un échec est
+suivi d'un backup (couleur alternative) vérifié de la même façon.
+
+Le backtest évalue chaque signal de la règle : la limite du stock actif
+(MAX_PENDING) et la fenêtre d'envoi de la file d'attente, qui décident
+lesquels sont publiés, ne sont pas simulées (voir le mode replay de main.py
+pour le comportement exact d'une configuration).
+
+Utilisation : python backtest.py messages.jsonl [--offsets 5-12] [--backup-offsets 9]
+              [--mappings current|all] [--source CHAT_ID] [--top 20]
+"""
+import argparse
+import itertools
+import sys
+import time
+
+import numpy as np
+
+from config import ALL_SUITS, SUIT_BITS, SUIT_MAPPING, build_prediction_lut
+from engine import FINAL_STATUSES
+from message_parser import parse_message
+from replay import load_message_log
+
+
+def load_history(path: str, source: int = None) -> dict:
+    """
+    Jeux finalisés du journal {numéro: masque du premier groupe} (première
+    version finalisée de chaque message). Les messages sont lus dans l'ordre
+    de leurs identifiants et les cycles du compteur mis bout à bout comme
+    dans `load_history_db`, pour qu'un journal de plusieurs jours soit évalué
+    en entier.
+    """
+    games = {}
+    seen = set()
+    base = 0
+    previous = None
+    for msg in sorted(load_message_log(path), key=lambda m: m['id']):
+        if msg['id'] in seen or (source is not None and msg['chat_id'] not in (None, source)):
+            continue
+        parsed = parse_message(msg['text'])
+        if not (parsed.finalized and parsed.game_number is not None and parsed.masks):
+            continue
+        seen.add(msg['id'])
+        game_number = parsed.game_number
+        if previous is not None and game_number < previous:
+            base += previous
+        previous = game_number
+        games.setdefault(base + game_number, parsed.masks[0])
+    return games
+
+
+def load_history_db(db_path: str, table_name: str) -> dict:
+    """
+    Jeux finalisés d'une table depuis l'historique `games` de la base d'état,
+    {numéro: masque du premier groupe}. Les cycles du compteur de la source
+    sont mis bout à bout : un numéro inférieur au précédent ouvre un cycle (le
+    séquenceur du bot n'en transmet pas d'autre), dont le jeu #1 suit le
+    dernier jeu du précédent, comme dans le bot ; les numéros manquants en
+    début de cycle restent des trous.
+    """
+    import sqlite3
+
+    games = {}
+    base = 0
+    previous = None
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT game_number, suits FROM games WHERE table_name = ? ORDER BY rowid",
+                            (table_name,))
+        for game_number, suits in rows:
+            if previous is not None and game_number < previous:
+                base += previous
+            previous = game_number
+            games.setdefault(base + game_number, suits)
+    finally:
+        conn.close()
+    return games
+
+
+def encode_history(games: dict, padding: int):
+    """
+    Tableaux (masques uint8, présence bool) indexés par numéro de jeu - premier
+    numéro, complétés de `padding` jeux absents pour les lectures décalées.
+    """
+    if not games:
+        return 0, np.zeros(padding, dtype=np.uint8), np.zeros(padding, dtype=bool)
+    first = min(games)
+    size = max(games) - first + 1 + padding
+    masks = np.zeros(size, dtype=np.uint8)
+    present = np.zeros(size, dtype=bool)
+    index = np.fromiter(games.keys(), dtype=np.int64, count=len(games)) - first
+    masks[index] = np.fromiter(games.values(), dtype=np.uint8, count=len(games))
+    present[index] = True
+    return first, masks, present
+
+
+def mapping_variants(kind: str = 'current') -> list:
+    """Mappings à évaluer : le mapping configuré, ou toutes les permutations des 4 couleurs."""
+    if kind == 'current':
+        return [dict(SUIT_MAPPING)]
+    return [dict(zip(ALL_SUITS, perm)) for perm in itertools.permutations(ALL_SUITS)]
+
+
+def _verify(suits, masks, present, shift, length):
+    """
+    Vérification en 2 chances de `suits` (tableau de bits, 0 = pas de prédiction)
+    sur les jeux décalés de `shift` et `shift + 1`. Retourne (✅0️⃣, ✅1️⃣, ❌) en booléens.
+    """
+    first_ok = present[shift:shift + length]
+    second_ok = present[shift + 1:shift + 1 + length]
+    found_first = (suits & masks[shift:shift + length]) != 0
+    found_second = (suits & masks[shift + 1:shift + 1 + length]) != 0
+    active = (suits != 0) & first_ok
+    hit0 = active & found_first
+    rest = active & ~found_first & second_ok
+    return hit0, rest & found_second, rest & ~found_second
+
+
+def run_grid(masks, present, mappings, offsets, backup_offsets, padding):
+    """
+    Évalue toutes les combinaisons mapping x offset x backup_offset.
+
+    Les mappings sont traités ensemble (tableaux de forme (mappings, jeux)) ;
+    les boucles ne portent que sur les décalages, quelques dizaines au plus.
+    """
+    length = len(masks) - padding
+    luts = np.array([build_prediction_lut(m) for m in mappings], dtype=np.uint8)
+    # Couleur du backup : mapping appliqué à la couleur prédite (bit -> bit), indexé par masque
+    alternates = np.zeros((len(mappings), 16), dtype=np.uint8)
+    for row, mapping in enumerate(mappings):
+        for suit, bit in SUIT_BITS.items():
+            alternates[row, bit] = SUIT_BITS[mapping.get(suit, suit)]
+
+    # Signal au jeu n (index i) si n-1 et n sont présents : LUT[masque(n-1) | masque(n)]
+    pair_ok = np.zeros(length, dtype=bool)
+    pair_ok[1:] = present[1:length] & present[:length - 1]
+    combined = np.zeros(length, dtype=np.uint8)
+    combined[1:] = masks[1:length] | masks[:length - 1]
+    suits = np.where(pair_ok, luts[:, combined], 0).astype(np.uint8)
+    backup_suits = np.take_along_axis(alternates, suits.astype(np.intp), axis=1)
+    signals = np.count_nonzero(suits, axis=1)
+
+    results = []
+    for offset in offsets:
+        hit0, hit1, miss = _verify(suits, masks, present, offset, length)
+        counts = [hit.sum(axis=1) for hit in (hit0, hit1, miss)]
+        for backup_offset in backup_offsets:
+            shift = offset + backup_offset
+            b_hit0, b_hit1, b_miss = _verify(np.where(miss, backup_suits, 0), masks, present, shift, length)
+            b_counts = [hit.sum(axis=1) for hit in (b_hit0, b_hit1, b_miss)]
+            for row, mapping in enumerate(mappings):
+                results.append(_summary(mapping, offset, backup_offset, int(signals[row]),
+                                        [int(c[row]) for c in counts], [int(c[row]) for c in b_counts]))
+    return results
+
+
+def _summary(mapping, offset, backup_offset, signals, counts, backup_counts):
+    resolved = sum(counts)
+    hits = counts[0] + counts[1]
+    backup_resolved = sum(backup_counts)
+    backup_hits = backup_counts[0] + backup_counts[1]
+    return {
+        'mapping': ''.join(mapping[s] for s in ALL_SUITS),
+        'offset': offset,
+        'backup_offset': backup_offset,
+        'signals': signals,
+        'outcomes': dict(zip(FINAL_STATUSES, counts)),
+        'hit_rate': hits / resolved if resolved else 0.0,
+        'backup_outcomes': dict(zip(FINAL_STATUSES, backup_counts)),
+        'backup_hit_rate': backup_hits / backup_resolved if backup_resolved else 0.0,
+        # Réussite au premier envoi ou à son backup, sur les prédictions résolues
+        'combined_hit_rate': (hits + backup_hits) / resolved if resolved else 0.0,
+    }
+
+
+def parse_range(value: str) -> list:
+    """'9', '5-12' ou '3,7,9' -> liste d'entiers."""
+    numbers = []
+    for part in value.split(','):
+        if '-' in part:
+            low, high = part.split('-')
+            numbers.extend(range(int(low), int(high) + 1))
+        else:
+            numbers.append(int(part))
+    return numbers
+
+
+def format_results(results, top: int) -> str:
+    header = f"{'mapping ' + ''.join(ALL_SUITS):<16}{'N+':>4}{'bk':>4}{'signaux':>9}" \
+             f"{'✅0️⃣':>8}{'✅1️⃣':>8}{'❌':>7}{'réussite':>10}{'backup':>8}{'total':>8}"
+    lines = [header]
+    for r in results[:top]:
+        o = r['outcomes']
+        lines.append(
+            f"{r['mapping']:<16}{r['offset']:>4}{r['backup_offset']:>4}{r['signals']:>9}"
+            f"{o['✅0️⃣']:>8}{o['✅1️⃣']:>8}{o['❌']:>8}{r['hit_rate']:>10.1%}"
+            f"{r['backup_hit_rate']:>8.1%}{r['combined_hit_rate']:>8.1%}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest vectorisé de la règle de paire")
+    parser.add_argument('log', help="journal JSONL ou CSV (même format que le mode replay)")
+    parser.add_argument('--offsets', default='9', help="décalages de la cible (N+1+offset), ex. 5-12")
+    parser.add_argument('--backup-offsets', default='9', help="décalages du backup après un échec")
+    parser.add_argument('--mappings', choices=('current', 'all'), default='current')
+    parser.add_argument('--source', type=int, default=None, help="ne garder que ce canal source")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    offsets = parse_range(args.offsets)
+    backup_offsets = parse_range(args.backup_offsets)
+    mappings = mapping_variants(args.mappings)
+
+    started = time.perf_counter()
+    games = load_history(args.log, args.source)
+    loaded = time.perf_counter()
+    padding = max(offsets) + max(backup_offsets) + 2
+    _, masks, present = encode_history(games, padding)
+    results = run_grid(masks, present, mappings, offsets, backup_offsets, padding)
+    results.sort(key=lambda r: r['hit_rate'], reverse=True)
+    elapsed = time.perf_counter() - loaded
+
+    print(f"📊 {len(games)} jeux, {len(results)} variantes évaluées en {elapsed:.3f}s "
+          f"(chargement du journal {loaded - started:.2f}s)")
+    print(format_results(results, args.top))
+    return results
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,283 @@
+"""
+Banc de charge et d'endurance des handlers Telegram.
+
+1. Charge : pour chaque multiplicateur de --rates, --games jeux générés sont
+   injectés au rythme normal (un jeu toutes les --game-interval secondes)
+   multiplié, via source_event_filter puis handle_message /
+   handle_edited_message comme le ferait Telethon, avec une rafale de --burst
+   éditions ⏰ par jeu. Chaque palier a donc le même nombre de mesures et dure
+   --games x --game-interval / multiplicateur (×10 : 200 jeux en 20 min,
+   ×100 : en 2 min). Mesures : latence des handlers (p50/p99/max), retard de
+   la boucle asyncio, profondeur de la file sortante.
+2. Endurance : --days journées de --games-per-day jeux à pleine vitesse avec
+   une horloge simulée (fenêtre 24 h des statistiques) et retour du compteur
+   de jeux à #N1 chaque jour ; l'état ne doit rester borné que par
+   l'expiration par numéro de jeu (reset quotidien avec --daily-reset).
+   tracemalloc mesure la mémoire à la fin de chaque journée : le banc échoue
+   (code 1) si elle augmente de plus de --max-growth-kb entre la fin de la
+   période de chauffe (--warmup-days, structures bornées remplies : fenêtre
+   de 1000 jeux, identifiants des messages envoyés...) et la dernière journée.
+
+Le client Telegram est remplacé par un client local qui ne conserve rien ;
+l'état est persisté dans une base SQLite temporaire et les logs passent par
+la journalisation réelle, écrite dans /dev/null.
+
+Utilisation : python benchmarks/bench_load.py [--rates 10,100] [--games 200] [--days 4]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RANKS = ('A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K')
+SUITS = ('♠️', '❤️', '♦️', '♣️')
+
+
+class LoadClient:
+    """Remplaçant de TelegramClient : répond aux envois et éditions sans réseau ni historique."""
+
+    def __init__(self):
+        self.next_id = 1
+        self.calls = 0
+
+    async def send_message(self, entity, message, **kwargs):
+        self.calls += 1
+        self.next_id += 1
+        return SimpleNamespace(id=self.next_id - 1)
+
+    async def edit_message(self, entity, message, text=None, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(id=message)
+
+    def is_connected(self):
+        return True
+
+
+def _card(rng) -> str:
+    return rng.choice(RANKS) + rng.choice(SUITS)
+
+
+def game_messages(rng, game_number: int, burst: int):
+    """(édition ?, texte) d'un jeu : message en cours, rafale d'éditions ⏰, résultat final."""
+    first = ''.join(_card(rng) for _ in range(rng.choice((2, 3))))
+    second = ''.join(_card(rng) for _ in range(rng.choice((2, 3))))
+    yield False, f"⏰#N{game_number}. {rng.randint(0, 9)}({first[:4]}) - ({second[:4]})"
+    for _ in range(burst):
+        yield True, f"⏰#N{game_number}. {rng.randint(0, 9)}({first[:4]}) - {rng.randint(0, 9)}({second[:4]})"
+    yield True, f"#N{game_number}. {rng.randint(0, 9)}({first}) - {rng.randint(0, 9)}({second}) #T{rng.randint(1, 20)} ✅"
+
+
+def percentiles_ms(values_ns) -> str:
+    if not values_ns:
+        return "aucune mesure"
+    values = sorted(values_ns)
+    pick = lambda pct: values[min(len(values) - 1, int(pct / 100 * len(values)))] / 1e6
+    return f"p50 {pick(50):.3f}  p99 {pick(99):.3f}  max {values[-1] / 1e6:.3f} ms"
+
+
+class Harness:
+
+    def __init__(self, bot, seed: int, burst: int):
+        self.bot = bot
+        self.rng = random.Random(seed)
+        self.burst = burst
+        self.source = bot.tables[0].source_channel_id
+        self.message_id = 0
+        self.latencies = None
+
+    async def dispatch(self, edited: bool, text: str):
+        event = SimpleNamespace(chat_id=self.source, message=SimpleNamespace(message=text, id=self.message_id))
+        started = time.perf_counter_ns()
+        # Même enchaînement que Telethon : pré-filtre synchrone puis handler
+        if self.bot.source_event_filter(event):
+            handler = self.bot.handle_edited_message if edited else self.bot.handle_message
+            await handler(event)
+        if self.latencies is not None:
+            self.latencies['edit' if edited else 'new'].append(time.perf_counter_ns() - started)
+
+    async def play_game(self, game_number: int, yield_each: bool):
+        self.message_id += 1
+        for edited, text in game_messages(self.rng, game_number, self.burst):
+            await self.dispatch(edited, text)
+            if yield_each:
+                await asyncio.sleep(0)
+
+    async def settle(self):
+        """Laisse la file sortante (au débit limité par chat) et le thread d'écriture se vider."""
+        outbound = self.bot.outbound
+        await asyncio.wait_for(outbound.drain(), timeout=30 + outbound.queue_depth() * outbound.min_interval)
+        while self.bot.store.backlog():
+            await asyncio.sleep(0.01)
+
+    # --- Charge ---
+
+    async def load(self, rate: float, games: int, game_interval: float, start_game: int) -> int:
+        bot = self.bot
+        interval = game_interval / rate
+        self.latencies = {'new': [], 'edit': []}
+        lags = []
+        max_depth = 0
+        stop = asyncio.Event()
+
+        async def watch_loop():
+            nonlocal max_depth
+            clock = time.perf_counter
+            while not stop.is_set():
+                expected = clock() + 0.005
+                await asyncio.sleep(0.005)
+                lags.append(max(0.0, clock() - expected))
+                max_depth = max(max_depth, bot.outbound.queue_depth())
+
+        watcher = asyncio.create_task(watch_loop())
+        loop = asyncio.get_running_loop()
+        started = next_at = loop.time()
+        for game_number in range(start_game, start_game + games):
+            await self.play_game(game_number, yield_each=False)
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+        elapsed = loop.time() - started
+        stop.set()
+        await watcher
+        await self.settle()
+
+        lags.sort()
+        print(f"\n🔥 ×{rate:g} : {games} jeux en {elapsed:.0f}s (un jeu toutes les {interval:.2f}s, "
+              f"{games * (self.burst + 2) / elapsed:.1f} événements/s)")
+        print(f"   handle_message         {percentiles_ms(self.latencies['new'])}")
+        print(f"   handle_edited_message  {percentiles_ms(self.latencies['edit'])}")
+        if lags:
+            print(f"   retard de la boucle    médiane {statistics.median(lags) * 1000:.2f}  "
+                  f"p99 {lags[int(0.99 * (len(lags) - 1))] * 1000:.2f}  max {lags[-1] * 1000:.2f} ms")
+        print(f"   file sortante          max {max_depth} opérations")
+        self.latencies = None
+        return start_game + games
+
+    # --- Endurance ---
+
+    async def soak(self, days: int, games_per_day: int, daily_reset: bool, warmup_days: int) -> list:
+        bot = self.bot
+        # Temps simulé : la fenêtre 24 h des statistiques suit les jeux, pas l'horloge réelle
+        now = [time.monotonic()]
+        for table in bot.tables:
+            table.rolling.clock = lambda: now[0]
+        # Débit Telegram non simulé en temps compressé
+        bot.outbound.min_interval = 0
+        step = 86400 / games_per_day
+
+        samples = []
+        snapshots = []
+        for day in range(1, days + 1):
+            started = time.perf_counter()
+            for game_number in range(1, games_per_day + 1):
+                await self.play_game(game_number, yield_each=True)
+                now[0] += step
+            await bot.sequencer.flush()
+            sizes = ', '.join(f"{t.name} {len(t.recent_games)} récents/{len(t.pending_predictions)} actives/"
+                              f"{len(t.queued_predictions)} en file/{t.lifecycle['rollovers']} retours du compteur"
+                              for t in bot.tables)
+            dedup = len(bot.processed_messages)
+            if daily_reset:
+                bot.daily_reset()
+            await self.settle()
+
+            gc.collect()
+            current = tracemalloc.get_traced_memory()[0]
+            samples.append(current)
+            if day == warmup_days or day == days:
+                snapshots.append(tracemalloc.take_snapshot())
+            print(f"   jour {day}: {current / 1024:>8.0f} Ko en {time.perf_counter() - started:.1f}s "
+                  f"(fin de journée : dédup {dedup}, {sizes})")
+
+        if len(snapshots) == 2:
+            top = snapshots[1].compare_to(snapshots[0], 'lineno')[:8]
+            print(f"   Plus fortes variations depuis le jour {warmup_days} :")
+            for stat in top:
+                print(f"     {stat.size_diff / 1024:+8.1f} Ko  {stat.traceback}")
+        return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge et d'endurance du bot")
+    parser.add_argument('--rates', default='10,100', help="Multiplicateurs du débit normal")
+    parser.add_argument('--games', type=int, default=200, help="Jeux par palier de charge (même nombre de mesures à chaque débit)")
+    parser.add_argument('--game-interval', type=float, default=60, help="Secondes entre deux jeux au débit normal")
+    parser.add_argument('--burst', type=int, default=10, help="Éditions ⏰ par jeu")
+    parser.add_argument('--days', type=int, default=4, help="Journées simulées pour l'endurance")
+    parser.add_argument('--warmup-days', type=int, default=2, help="Journées avant la mesure de référence")
+    parser.add_argument('--games-per-day', type=int, default=1440)
+    parser.add_argument('--daily-reset', action='store_true', help="Reset complet à la fin de chaque journée")
+    parser.add_argument('--max-growth-kb', type=float, default=256)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_load_')
+    os.environ.update({
+        'API_ID': '1', 'API_HASH': 'bench', 'BOT_TOKEN': 'bench', 'ADMIN_ID': '0',
+        'PORT': '0', 'STATE_DB_PATH': os.path.join(tmp, 'state.db'), 'TELEGRAM_SESSION': '',
+    })
+    sys.path.insert(0, ROOT)
+    import bot
+    from logging_setup import setup_logging, stop_logging
+    from config import LOG_LEVEL, LOG_RATE_LIMIT, LOG_RATE_WINDOW, LOG_QUEUE_SIZE
+
+    # Journalisation réelle (file, thread d'écriture, limitation) vers /dev/null
+    devnull = open(os.devnull, 'w', encoding='utf-8')
+    setup_logging('json', LOG_LEVEL, LOG_RATE_LIMIT, LOG_RATE_WINDOW, LOG_QUEUE_SIZE, stream=devnull)
+
+    async def run() -> bool:
+        stub = LoadClient()
+        bot.client = stub
+        bot.outbound.client = stub
+        bot.restore_state(bot.store.open())
+        for table in bot.tables:
+            table.prediction_channel_ok = True
+        harness = Harness(bot, args.seed, args.burst)
+
+        rates = [float(r) for r in args.rates.split(',') if r]
+        planned = sum(args.games * args.game_interval / rate for rate in rates)
+        print(f"🔥 Charge : {args.games} jeux par palier (×{', ×'.join(f'{r:g}' for r in rates)}), "
+              f"environ {planned / 60:.0f} min")
+        game_number = 1
+        for rate in rates:
+            game_number = await harness.load(rate, args.games, args.game_interval, game_number)
+        await bot.sequencer.flush()
+        bot.daily_reset()
+        await harness.settle()
+
+        print(f"\n🕰️ Endurance : {args.days} jours simulés de {args.games_per_day} jeux "
+              f"({args.burst} éditions ⏰ par jeu, reset quotidien {'oui' if args.daily_reset else 'non'})")
+        tracemalloc.start(10)
+        samples = await harness.soak(args.days, args.games_per_day, args.daily_reset, args.warmup_days)
+        tracemalloc.stop()
+        print(f"   {stub.calls} appels Telegram simulés, {bot.store.stats['writes']} écritures SQLite")
+
+        if len(samples) <= args.warmup_days:
+            print(f"⚠️ Au moins {args.warmup_days + 1} jours sont nécessaires pour vérifier la mémoire")
+            return True
+        growth = (samples[-1] - samples[args.warmup_days - 1]) / 1024
+        period = f"entre la fin du jour {args.warmup_days} et du jour {len(samples)}"
+        if growth > args.max_growth_kb:
+            print(f"❌ Mémoire non stable : +{growth:.0f} Ko {period} (limite {args.max_growth_kb:.0f} Ko)")
+            return False
+        print(f"✅ Mémoire stable : {growth:+.0f} Ko {period}")
+        return True
+
+    try:
+        ok = asyncio.run(run())
+    finally:
+        bot.store.close()
+        stop_logging()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Micro-benchmark : analyse en une passe (message_parser) contre l'ancienne
+chaîne regex/replace de main.py.
+
+Utilisation : python benchmarks/bench_parser.py [nombre_de_messages]
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ALL_SUITS  # noqa: E402
+from message_parser import parse_message, suit_mask  # noqa: E402
+
+
+# --- Ancienne implémentation (référence, copiée telle quelle) ---
+
+def extract_game_number(message: str):
+    match = re.search(r"#N\s*(\d+)\.?", message, re.IGNORECASE)
+    if match:
+        return int(match.group(1))
+    return None
+
+def extract_parentheses_groups(message: str):
+    return re.findall(r"\(([^)]*)\)", message)
+
+def normalize_suits(group_str: str) -> str:
+    normalized = group_str.replace('❤️', '♥').replace('❤', '♥').replace('♥️', '♥')
+    normalized = normalized.replace('♠️', '♠').replace('♦️', '♦').replace('♣️', '♣')
+    return normalized
+
+def get_suits_in_group(group_str: str):
+    normalized = normalize_suits(group_str)
+    return [s for s in ALL_SUITS if s in normalized]
+
+def has_suit_in_group(group_str: str, target_suit: str) -> bool:
+    normalized = normalize_suits(group_str)
+    target_normalized = normalize_suits(target_suit)
+    for suit in ALL_SUITS:
+        if suit in target_normalized and suit in normalized:
+            return True
+    return False
+
+def is_message_finalized(message: str) -> bool:
+    if '⏰' in message:
+        return False
+    return '✅' in message or '🔰' in message
+
+
+def legacy_pipeline(message: str):
+    """Ce que faisait process_finalized_message avant le parseur."""
+    if not is_message_finalized(message):
+        return None
+    game_number = extract_game_number(message)
+    if game_number is None:
+        return None
+    groups = extract_parentheses_groups(message)
+    if not groups:
+        return None
+    suits = set(get_suits_in_group(groups[0]))
+    has_suit_in_group(groups[0], '♠')
+    return game_number, suits
+
+
+def parsed_pipeline(message: str):
+    parsed = parse_message(message)
+    if not parsed.finalized or parsed.game_number is None or not parsed.groups:
+        return None
+    mask = parsed.masks[0]
+    mask & 1
+    return parsed.game_number, mask
+
+
+# --- Données synthétiques : 3 éditions ⏰ pour 1 message finalisé ---
+
+def generate_messages(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    suits = ['♠️', '❤️', '♦️', '♣️', '♥']
+    ranks = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+
+    def group():
+        return ''.join(rng.choice(ranks) + rng.choice(suits) for _ in range(rng.choice((2, 3))))
+
+    messages = []
+    game = 1
+    while len(messages) < count:
+        g1, g2 = group(), group()
+        for _ in range(3):
+            messages.append(f"⏰#N{game}. {rng.randint(0, 9)}({g1[:4]}) - ({g2[:4]})")
+        messages.append(f"#N{game}. {rng.randint(0, 9)}({g1}) - {rng.randint(0, 9)}({g2}) #T{rng.randint(1, 20)} ✅")
+        game += 1
+    return messages[:count]
+
+
+def check_equivalence(messages):
+    for message in messages:
+        legacy = legacy_pipeline(message)
+        parsed = parsed_pipeline(message)
+        if legacy is None or parsed is None:
+            assert legacy == parsed, message
+            continue
+        game_number, suits = legacy
+        assert parsed[0] == game_number, message
+        assert parsed[1] == suit_mask(''.join(suits)), message
+
+
+def bench(label, func, messages, repeat=5):
+    def run():
+        for message in messages:
+            func(message)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    per_msg_ns = best / len(messages) * 1e9
+    print(f"{label:<32} {best * 1000:8.2f} ms  {per_msg_ns:8.1f} ns/msg")
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    messages = generate_messages(count)
+    finalized = [m for m in messages if is_message_finalized(m)]
+    check_equivalence(messages)
+
+    print(f"{count} messages ({len(finalized)} finalisés)")
+    for label, subset in (("mélange ⏰/finalisés", messages), ("finalisés uniquement", finalized)):
+        print(f"\n-- {label} --")
+        old = bench("ancienne chaîne regex/replace", legacy_pipeline, subset)
+        new = bench("parse_message", parsed_pipeline, subset)
+        print(f"{'gain':<32} {old / new:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
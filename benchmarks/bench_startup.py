@@ -0,0 +1,149 @@
+"""
+Benchmark du démarrage : imports et délai jusqu'au premier message traité.
+
+1. Profil des imports (`python -X importtime -c "import bot"`) : durée
+   totale et modules les plus coûteux.
+2. Démarrages complets de bot.main() dans un processus neuf, avec un client
+   Telegram local (connexion simulée en --connect-delay secondes) : durée de
+   chaque étape (voir bot.startup) et délai total entre le lancement du
+   processus et le premier message finalisé traité.
+
+Utilisation : python benchmarks/bench_startup.py [--runs 5] [--connect-delay 0.3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FINALIZED_MESSAGE = "#N1. ✅3(8♠️K❤️) - 9(7♦️2♣️) #T12"
+
+
+def child_env(db_path: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        'API_ID': '1', 'API_HASH': 'bench', 'BOT_TOKEN': 'bench', 'ADMIN_ID': '0',
+        'PORT': '0', 'STATE_DB_PATH': db_path, 'TELEGRAM_SESSION': '',
+    })
+    return env
+
+
+def profile_imports(top: int = 12):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import bot'],
+        cwd=ROOT, env=child_env(''), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        self_us, cumulative_us, name = int(parts[0]), int(parts[1]), parts[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, name.strip(), self_us, cumulative_us))
+
+    total = next((cum for depth, name, _, cum in rows if name == 'bot'), 0)
+    print(f"📦 Import de bot: {total / 1000:.1f} ms")
+    # Modules importés directement par bot (profondeur 1), les plus coûteux en premier
+    direct = sorted((r for r in rows if r[0] == 1), key=lambda r: r[3], reverse=True)
+    for _, name, self_us, cumulative_us in direct[:top]:
+        print(f"   {name:<28} {cumulative_us / 1000:>7.1f} ms (propre {self_us / 1000:.1f} ms)")
+
+
+def run_startups(runs: int, connect_delay: float):
+    stages = {}
+    totals = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            launched = time.time()
+            result = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', str(connect_delay)],
+                cwd=ROOT, env=child_env(os.path.join(tmp, 'state.db')), capture_output=True, text=True,
+            )
+        if result.returncode != 0 or not result.stdout.strip():
+            print(result.stderr[-2000:])
+            raise SystemExit("❌ Démarrage en échec")
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        totals.append(report['first_message_at'] - launched)
+        for stage, seconds in report['startup'].items():
+            stages.setdefault(stage, []).append(seconds)
+
+    print(f"\n🚀 {runs} démarrages (connexion Telegram simulée: {connect_delay * 1000:.0f} ms)")
+    for stage, values in sorted(stages.items(), key=lambda item: statistics.median(item[1])):
+        print(f"   {stage:<20} médiane {statistics.median(values) * 1000:>7.1f} ms  max {max(values) * 1000:>7.1f} ms")
+    print(f"   {'processus -> 1er msg':<20} médiane {statistics.median(totals) * 1000:>7.1f} ms  "
+          f"max {max(totals) * 1000:>7.1f} ms")
+
+
+# --- Processus enfant : démarrage réel de bot.main() avec un client local ---
+
+def child(connect_delay: float):
+    sys.path.insert(0, ROOT)
+    import logging
+    from types import SimpleNamespace
+
+    logging.disable(logging.CRITICAL)
+    import bot
+    from replay import ReplayClient
+    from telethon.sessions import StringSession
+
+    class StartupClient(ReplayClient):
+        def __init__(self):
+            super().__init__()
+            self.session = StringSession('')
+            self._connected = False
+            self._disconnected = asyncio.Event()
+
+        async def start(self, bot_token=None):
+            await asyncio.sleep(connect_delay)
+            self._connected = True
+
+        def is_connected(self):
+            return self._connected
+
+        async def get_messages(self, entity, ids=None):
+            return [None] * len(ids or ())
+
+        async def run_until_disconnected(self):
+            await self._disconnected.wait()
+
+        async def disconnect(self):
+            self._connected = False
+            self._disconnected.set()
+
+    stub = StartupClient()
+    bot.client = stub
+    bot.outbound.client = stub
+
+    async def run():
+        task = asyncio.create_task(bot.main())
+        while 'catch_up' not in bot.startup:
+            await asyncio.sleep(0.001)
+        source = bot.tables[0].source_channel_id
+        event = SimpleNamespace(chat_id=source, message=SimpleNamespace(message=FINALIZED_MESSAGE, id=1))
+        await bot.handle_message(event)
+        first_message_at = time.time()
+        await stub.disconnect()
+        await task
+        print(json.dumps({'startup': bot.startup, 'first_message_at': first_message_at}))
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        child(float(sys.argv[2]))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage du bot")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--connect-delay', type=float, default=0.3)
+    args = parser.parse_args()
+    profile_imports()
+    run_startups(args.runs, args.connect_delay)
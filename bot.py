@@ -0,0 +1,874 @@
+"""
+Bot de prédiction : client Telegram et handlers, tables, persistance, file
+sortante, serveur web (API, métriques) et démarrage (`main`).
+
+Tout est créé à l'import de ce module. Il n'est importé que par main.py
+(point d'entrée), le mode replay et les bancs de mesure : les processus de
+travail du pool de jobs n'en ont pas besoin.
+"""
+# Début de l'import : référence des temps de démarrage (voir `startup`)
+from time import perf_counter
+_IMPORT_STARTED = perf_counter()
+
+import os
+import asyncio
+import json
+import re
+import logging
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone, time
+from telethon import TelegramClient, events
+from telethon.sessions import StringSession
+from aiohttp import web
+from config import (
+    API_ID, API_HASH, BOT_TOKEN, ADMIN_ID, PORT, TABLES,
+    DEDUP_CACHE_SIZE, OUTBOUND_MIN_INTERVAL, STATE_DB_PATH,
+    CATCHUP_MAX_MESSAGES, CATCHUP_PAGE_SIZE, CATCHUP_CHECK_INTERVAL,
+    JOB_WORKERS, HANDLER_BUDGET_MS, BACKTEST_LOG_PATH, SEQUENCER_TIMEOUT,
+    ROLLOVER_GAP, DAILY_RESET_TIME,
+    LOG_FORMAT, LOG_LEVEL, LOG_RATE_LIMIT, LOG_RATE_WINDOW, LOG_QUEUE_SIZE,
+    SUIT_SYMBOLS, SUIT_DISPLAY
+)
+from message_parser import parse_message, is_message_finalized
+from dedup import DedupCache
+from outbound import OutboundDispatcher
+from state_store import StateStore, read_value
+from metrics import REGISTRY, BudgetGuard, monitor_event_loop_lag
+from engine import build_tables, index_by_source
+from live_feed import LiveFeed
+from sequencer import GameSequencer
+from jobs import JobRunner, history_job, backtest_job, export_job
+from logging_setup import setup_logging, LOG_DROPPED
+from profiler import PROFILER, MAX_DURATION as PROFILE_MAX_DURATION, write_report
+
+# --- Configuration et Initialisation ---
+setup_logging(LOG_FORMAT, LOG_LEVEL, LOG_RATE_LIMIT, LOG_RATE_WINDOW, LOG_QUEUE_SIZE)
+logger = logging.getLogger(__name__)
+
+def check_config() -> bool:
+    """Vérifications minimales de la configuration (inutiles en mode replay)."""
+    if not API_ID or API_ID == 0:
+        logger.error("API_ID manquant")
+        return False
+    if not API_HASH:
+        logger.error("API_HASH manquant")
+        return False
+    if not BOT_TOKEN:
+        logger.error("BOT_TOKEN manquant")
+        return False
+    if DAILY_RESET_TIME and not re.fullmatch(r'([01]?\d|2[0-3]):[0-5]\d', DAILY_RESET_TIME):
+        logger.error("DAILY_RESET_TIME invalide (HH:MM attendu): %s", DAILY_RESET_TIME)
+        return False
+    return True
+
+for _table in TABLES:
+    logger.info("Configuration [%s]: SOURCE_CHANNEL=%s, PREDICTION_CHANNEL=%s", _table['name'], _table['source'], _table['prediction'])
+
+# Initialisation du client Telegram avec session string ou nouvelle session
+# (valeurs factices si absentes : check_config() bloque le démarrage du bot,
+# mais le module reste importable pour le mode replay)
+# Sans TELEGRAM_SESSION, la session enregistrée au démarrage précédent évite une nouvelle authentification
+session_string = os.getenv('TELEGRAM_SESSION', '') or read_value(STATE_DB_PATH, 'meta', 'telegram_session') or ''
+client = TelegramClient(StringSession(session_string), API_ID or 1, API_HASH or 'absent')
+# File sortante : les envois/éditions Telegram ne bloquent pas le traitement des jeux
+outbound = OutboundDispatcher(client, min_interval=OUTBOUND_MIN_INTERVAL)
+# Persistance de l'état (écritures en arrière-plan, ouverte au démarrage du bot)
+store = StateStore(STATE_DB_PATH)
+# Calculs lourds (backtests, exports) hors de la boucle asyncio
+jobs = JobRunner(JOB_WORKERS)
+# Signale les traitements qui bloquent la boucle au-delà du budget
+loop_guard = BudgetGuard(HANDLER_BUDGET_MS / 1000)
+
+# --- Tables de prédiction (état et stratégie propres à chaque paire de canaux) ---
+tables = build_tables(TABLES, outbound, store)
+# Canal source -> tables alimentées par ce canal
+tables_by_source = index_by_source(tables)
+# Événements en direct (SSE) et cache des réponses web, invalidé à chaque changement d'état
+feed = LiveFeed()
+for _t in tables:
+    _t.on_event = feed.publish
+
+# --- Variables Globales d'État (par canal source) ---
+# Messages finalisés déjà traités, clé (chat_id, message_id, hash du contenu)
+processed_messages = DedupCache(DEDUP_CACHE_SIZE)
+last_transferred_game = {}
+# Dernier message finalisé traité par canal source (point de départ du rattrapage)
+last_source_message_ids = {}
+
+# Pré-filtre des événements Telethon : compteurs par étape
+event_stats = {
+    'other_chat': 0,
+    'in_progress': 0,
+    'already_seen': 0,
+    'accepted': 0,
+}
+
+# --- Métriques (/metrics) ---
+for _stage in event_stats:
+    REGISTRY.counter_fn('bot_events_total', "Événements du pré-filtre par étape",
+                        lambda stage=_stage: event_stats[stage], stage=_stage)
+FINALIZED_GAMES = REGISTRY.counter('bot_finalized_games_total', "Jeux finalisés traités")
+PARSE_TIME = REGISTRY.histogram('bot_parse_seconds', "Durée d'analyse d'un message finalisé")
+HANDLER_LATENCY = {
+    kind: REGISTRY.histogram('bot_handler_seconds', "Durée de traitement d'un événement source (attente du séquenceur comprise)",
+                                   handler=kind)
+    for kind in ('new', 'edited')
+}
+for _t in tables:
+    REGISTRY.gauge('bot_pending_predictions', "Prédictions actives",
+                   lambda t=_t: len(t.pending_predictions), table=_t.name)
+    REGISTRY.gauge('bot_queued_predictions', "Prédictions en file d'attente",
+                   lambda t=_t: len(t.queued_predictions), table=_t.name)
+    REGISTRY.gauge('bot_recent_games', "Jeux récents en mémoire", lambda t=_t: len(t.recent_games), table=_t.name)
+    REGISTRY.gauge('bot_current_game', "Numéro du jeu actuel", lambda t=_t: t.current_game_number, table=_t.name)
+REGISTRY.gauge('bot_outbound_queue_depth', "Opérations Telegram en file", lambda: outbound.queue_depth())
+REGISTRY.gauge('bot_dedup_cache_size', "Entrées du cache de déduplication", lambda: len(processed_messages))
+CATCHUP_RUNS = REGISTRY.counter('bot_catchup_runs_total', "Rattrapages relancés après des messages manqués")
+
+# Canaux source en cours de rattrapage : leurs événements en direct sont mis de côté jusqu'à la fin
+catching_up = set()
+catchup_buffer = []
+
+source_channel_ok = False
+transfer_enabled = True # Initialisé à True
+
+# Étapes du démarrage : secondes depuis le début de l'import de ce module
+startup = {}
+
+def mark_startup(stage: str):
+    startup[stage] = perf_counter() - _IMPORT_STARTED
+    REGISTRY.gauge('bot_startup_seconds', "Durée du démarrage jusqu'à chaque étape", stage=stage).set(startup[stage])
+    logger.info("⏱️ Démarrage - %s: %.0f ms", stage, startup[stage] * 1000)
+
+# --- Traitement des messages source ---
+
+async def process_finalized_message(message_text: str, chat_id: int, message_id: int = 0):
+    """Traite un message finalisé pour la vérification et la création de prédictions."""
+    try:
+        source_tables = tables_by_source.get(chat_id)
+        if not source_tables:
+            return
+
+        t0 = perf_counter()
+        parsed = parse_message(message_text)
+        elapsed = perf_counter() - t0
+        PARSE_TIME.observe(elapsed)
+        loop_guard.check('parse_message', elapsed)
+        if PROFILER.active:
+            PROFILER.record('parse_message', elapsed)
+        if not parsed.finalized:
+            return
+
+        game_number = parsed.game_number
+        if game_number is None:
+            return
+
+        # Sans identifiant de message (appel direct), le numéro de jeu en tient lieu
+        if processed_messages.seen((chat_id, message_id or -game_number, hash(message_text))):
+            return
+        FINALIZED_GAMES.inc()
+        if 'first_message' not in startup:
+            mark_startup('first_message')
+
+        if len(parsed.groups) < 1:
+            # Jeu sans groupe : transmis quand même pour que la séquence n'attende pas ce numéro
+            await sequencer.submit(chat_id, game_number, (message_id, None, 0), message_id)
+            return
+
+        first_group = parsed.groups[0]
+        first_mask = parsed.masks[0]
+
+        logger.info("Jeu #%s finalisé (chat_id: %s) - Groupe1: %s", game_number, chat_id, first_group)
+
+        # --- Transfert à l'administrateur (si activé) ---
+        if transfer_enabled and chat_id not in catching_up and ADMIN_ID and ADMIN_ID != 0 \
+                and last_transferred_game.get(chat_id) != game_number:
+            transfer_msg = f"📨 **Message finalisé du canal source:**\n\n{message_text}"
+            outbound.send_message(ADMIN_ID, transfer_msg)
+            last_transferred_game[chat_id] = game_number
+
+        # --- Mise en ordre par numéro de jeu avant toute transition d'état ---
+        await sequencer.submit(chat_id, game_number, (message_id, first_group, first_mask), message_id)
+
+    except Exception as e:
+        logger.error("Erreur traitement message: %s", e)
+        import traceback
+        logger.error(traceback.format_exc())
+
+async def apply_game(chat_id: int, game_number: int, payload):
+    """Vérification, file d'attente et règle de prédiction de chaque table, appelée dans l'ordre des jeux."""
+    message_id, first_group, first_mask = payload
+    # Temps réellement passé sur la boucle : le budget ne compte pas l'attente du verrou du séquenceur
+    started = perf_counter()
+    try:
+        if message_id > last_source_message_ids.get(chat_id, 0):
+            last_source_message_ids[chat_id] = message_id
+        if first_group is not None:
+            for table in tables_by_source[chat_id]:
+                await table.process_game(game_number, first_group, first_mask)
+
+        store.put('meta', 'sources', {
+            'last_transferred_game': last_transferred_game,
+            'last_source_message_ids': last_source_message_ids
+        })
+
+    except Exception as e:
+        logger.error("Erreur traitement jeu #%s: %s", game_number, e)
+        import traceback
+        logger.error(traceback.format_exc())
+    elapsed = perf_counter() - started
+    loop_guard.check('apply_game', elapsed)
+    if PROFILER.active:
+        PROFILER.record('apply_game', elapsed)
+
+# Un seul jeu traité à la fois, dans l'ordre des numéros, par canal source
+sequencer = GameSequencer(apply_game, timeout=SEQUENCER_TIMEOUT, reset_gap=ROLLOVER_GAP)
+for _key in ('in_order', 'reordered', 'late', 'timeouts', 'skipped_games', 'resets'):
+    REGISTRY.counter_fn('bot_sequencer_total', "Jeux mis en ordre par le séquenceur",
+                        lambda key=_key: sequencer.stats[key], outcome=_key)
+REGISTRY.gauge('bot_sequencer_buffered', "Jeux en attente d'un numéro précédent", lambda: sequencer.buffered())
+    # --- Gestion des Messages (Hooks Telethon) ---
+
+def source_event_filter(event) -> bool:
+    """
+    Pré-filtre synchrone appelé par Telethon avant de planifier un handler :
+    les événements d'autres chats, les éditions en cours (⏰) et les messages
+    finalisés déjà vus ne coûtent ni get_chat() ni coroutine.
+    """
+    chat_id = event.chat_id
+    if chat_id not in tables_by_source:
+        event_stats['other_chat'] += 1
+        return False
+
+    message_text = event.message.message or ''
+    if not is_message_finalized(message_text):
+        event_stats['in_progress'] += 1
+        return False
+
+    if (chat_id, event.message.id, hash(message_text)) in processed_messages:
+        event_stats['already_seen'] += 1
+        return False
+
+    event_stats['accepted'] += 1
+    return True
+
+@client.on(events.NewMessage(func=source_event_filter))
+async def handle_message(event):
+    """Gère les nouveaux messages finalisés du canal source."""
+    try:
+        if event.chat_id in catching_up:
+            catchup_buffer.append((event.message.message, event.chat_id, event.message.id))
+            return
+        t0 = perf_counter()
+        await process_finalized_message(event.message.message, event.chat_id, event.message.id)
+        elapsed = perf_counter() - t0
+        HANDLER_LATENCY['new'].observe(elapsed)
+        if PROFILER.active:
+            PROFILER.record('handle_message', elapsed)
+
+    except Exception as e:
+        logger.error("Erreur handle_message: %s", e)
+
+@client.on(events.MessageEdited(func=source_event_filter))
+async def handle_edited_message(event):
+    """Gère les messages édités du canal source (souvent pour la finalisation)."""
+    try:
+        if event.chat_id in catching_up:
+            catchup_buffer.append((event.message.message, event.chat_id, event.message.id))
+            return
+        t0 = perf_counter()
+        await process_finalized_message(event.message.message, event.chat_id, event.message.id)
+        elapsed = perf_counter() - t0
+        HANDLER_LATENCY['edited'].observe(elapsed)
+        if PROFILER.active:
+            PROFILER.record('handle_edited_message', elapsed)
+
+    except Exception as e:
+        logger.error("Erreur handle_edited_message: %s", e)
+
+# --- Commandes Administrateur ---
+
+async def reject_non_admin(event) -> bool:
+    """Commandes coûteuses ou sensibles : réservées à ADMIN_ID et refusées à tous tant qu'il n'est pas défini."""
+    if ADMIN_ID and event.sender_id == ADMIN_ID:
+        return False
+    await event.respond("Commande réservée à l'administrateur" + ("" if ADMIN_ID else " (ADMIN_ID non défini)"))
+    return True
+
+@client.on(events.NewMessage(pattern='/start'))
+async def cmd_start(event):
+    if event.is_group or event.is_channel: return
+    await event.respond("🤖 **Bot de Prédiction Baccarat**\n\nCommandes: `/status`, `/help`, `/debug`, `/profile`, `/backtest`, `/export`, `/checkchannels`")
+
+@client.on(events.NewMessage(pattern='/status'))
+async def cmd_status(event):
+    if event.is_group or event.is_channel: return
+    if event.sender_id != ADMIN_ID and ADMIN_ID != 0:
+        await event.respond("Commande réservée à l'administrateur")
+        return
+
+    status_msg = "📊 **État des prédictions:**\n"
+    for table in tables:
+        current = table.current_game_number
+        status_msg += f"\n🎲 **Table {table.name}** - 🎮 Jeu actuel: #{current}\n"
+        if table.pending_predictions:
+            status_msg += f"**🔮 Actives ({len(table.pending_predictions)}):**\n"
+            for game_num, pred in sorted(table.pending_predictions.items()):
+                distance = game_num - current
+                status_msg += f"• Jeu #{pred.display_game}: {SUIT_SYMBOLS[pred.suit]} - Statut: {pred.status} (dans {distance} jeux)\n"
+        else: status_msg += "**🔮 Aucune prédiction active**\n"
+
+        if table.queued_predictions:
+            status_msg += f"**📋 En file d'attente ({len(table.queued_predictions)}):**\n"
+            for game_num, pred in sorted(table.queued_predictions.items()):
+                distance = game_num - current
+                status_msg += f"• Jeu #{pred.display_game}: {SUIT_SYMBOLS[pred.suit]} (dans {distance} jeux)\n"
+
+        status_msg += "**📈 Statistiques glissantes:**\n"
+        for window, summary in table.rolling.summaries():
+            suits = ' '.join(f"{SUIT_DISPLAY[s]}{rate:.0%}" for s, rate in summary['suit_rates'].items())
+            o = summary['outcomes']
+            status_msg += (
+                f"• {window} ({summary['games']}): {suits} | règle {summary['trigger_rate']:.0%} | "
+                f"✅0️⃣ {o['✅0️⃣']} ✅1️⃣ {o['✅1️⃣']} ❌ {o['❌']} 🗑️ {o['supprimée']} "
+                f"(réussite {summary['hit_rate']:.0%})\n"
+            )
+    await event.respond(status_msg)
+
+@client.on(events.NewMessage(pattern='/debug'))
+async def cmd_debug(event):
+    """/debug : identifiants des canaux, compteurs internes et jobs en cours."""
+    if event.is_group or event.is_channel: return
+    if await reject_non_admin(event): return
+
+    total = sum(event_stats.values())
+    dedup = processed_messages.stats()
+    seq = sequencer.stats
+    out = outbound.stats
+    api_avg = out['api_latency_total'] / out['api_calls'] if out['api_calls'] else 0.0
+    queue_avg = out['queue_latency_total'] / out['api_calls'] if out['api_calls'] else 0.0
+    tables_msg = ''.join(
+        f"• {t.name}: `{t.source_channel_id}` ➡️ `{t.prediction_channel_id}` "
+        f"({'✅' if t.prediction_channel_ok else '❌'}) - {t.strategy.name} N+{t.strategy.target_offset}, "
+        f"max {t.max_pending} actives, jeux récents {len(t.recent_games)}/{t.recent_games.capacity}\n"
+        f"  ♻️ fenêtre {t.game_window} jeux - retours du compteur: {t.lifecycle['rollovers']}, "
+        f"prédictions expirées: {t.lifecycle['expired_predictions']}, jeux expirés: {t.lifecycle['expired_games']}\n"
+        for t in tables
+    )
+    debug_msg = (
+        f"🛠️ **Debug**\n\n"
+        f"📥 Canaux source: {'✅' if source_channel_ok else '❌'}\n"
+        f"**🎲 Tables ({len(tables)}):**\n{tables_msg}"
+        f"📨 Transfert: {'activé' if transfer_enabled else 'désactivé'}\n"
+        f"🕐 Reset planifié: {f'{DAILY_RESET_TIME} WAT' if DAILY_RESET_TIME else 'désactivé'}\n\n"
+        f"**🔎 Pré-filtre des événements ({total}):**\n"
+        f"• Autres chats: {event_stats['other_chat']}\n"
+        f"• En cours (⏰): {event_stats['in_progress']}\n"
+        f"• Déjà vus: {event_stats['already_seen']}\n"
+        f"• Acceptés: {event_stats['accepted']}\n\n"
+        f"**🧹 Cache de déduplication:**\n"
+        f"• Taille: {dedup['size']}/{dedup['capacity']}\n"
+        f"• Hits: {dedup['hits']} | Misses: {dedup['misses']} | Évictions: {dedup['evictions']}\n\n"
+        f"**🔢 Séquenceur ({SEQUENCER_TIMEOUT}s):**\n"
+        f"• Dans l'ordre: {seq['in_order']} | Remis en ordre: {seq['reordered']} | En attente: {sequencer.buffered()}\n"
+        f"• Tardifs ignorés: {seq['late']} | Expirations: {seq['timeouts']} ({seq['skipped_games']} jeux manquants) "
+        f"| Nouvelles séquences: {seq['resets']}\n\n"
+        f"**📤 File sortante:**\n"
+        f"• En file: {outbound.queue_depth()} (max {out['max_depth']})\n"
+        f"• Envoyés: {out['sent']} | Édités: {out['edited']} | Échecs: {out['failed']}\n"
+        f"• Éditions fusionnées: {out['coalesced']} | Éditions perdues (message inconnu): {out['dropped_edits']} "
+        f"| FloodWait: {out['flood_waits']}\n"
+        f"• Latence API moy/max: {api_avg * 1000:.0f}/{out['api_latency_max'] * 1000:.0f} ms\n"
+        f"• Délai file + appel moy/max: {queue_avg * 1000:.0f}/{out['queue_latency_max'] * 1000:.0f} ms\n\n"
+        f"**⚙️ Jobs ({jobs.max_workers} processus):**\n"
+        f"• Lancés: {jobs.stats['submitted']} | Terminés: {jobs.stats['completed']} | Échecs: {jobs.stats['failed']}\n"
+        + ''.join(f"• En cours #{job_id} {name}: {elapsed:.1f}s\n" for job_id, name, elapsed in jobs.describe())
+        + f"\n**🐢 Budget boucle ({loop_guard.budget * 1000:.0f} ms):**\n"
+        + (''.join(f"• {name}: {elapsed * 1000:.1f} ms à {datetime.fromtimestamp(at).strftime('%H:%M:%S')}\n"
+                   for name, (elapsed, at) in loop_guard.last_exceeded.items()) or "• Aucun dépassement\n")
+        + f"\n**📝 Journal ({LOG_FORMAT}, max {LOG_RATE_LIMIT} lignes identiques / {LOG_RATE_WINDOW:.0f}s):**\n"
+        f"• Lignes limitées: {LOG_DROPPED['rate_limit'].value:.0f} | File pleine: {LOG_DROPPED['queue_full'].value:.0f}\n"
+    )
+    await event.respond(debug_msg)
+
+@client.on(events.NewMessage(pattern=r'/profile'))
+async def cmd_profile(event):
+    """/profile [secondes] : profil de la boucle (cProfile et temps mur par section) envoyé en fichier."""
+    if event.is_group or event.is_channel: return
+    if await reject_non_admin(event): return
+    if PROFILER.active:
+        await event.respond("⏳ Un profilage est déjà en cours")
+        return
+
+    args = event.message.message.split()[1:]
+    try:
+        seconds = min(max(float(args[0]) if args else 30.0, 1.0), PROFILE_MAX_DURATION)
+    except ValueError:
+        await event.respond(f"Usage: `/profile [secondes]` (max {PROFILE_MAX_DURATION})")
+        return
+
+    await event.respond(f"🔬 Profilage de la boucle pendant {seconds:.0f}s...")
+    PROFILER.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        duration, profile, sections = PROFILER.stop()
+
+    out_dir = tempfile.mkdtemp(prefix='profile_')
+    try:
+        # Tri et écriture du rapport hors de la boucle
+        paths = await asyncio.to_thread(write_report, duration, profile, sections, out_dir)
+        for path in paths:
+            await client.send_file(event.chat_id, path, caption=f"🔬 {os.path.basename(path)}", force_document=True)
+    except Exception as e:
+        logger.error("Erreur profilage: %s", e)
+        await event.respond(f"❌ Profilage impossible: {e}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+@client.on(events.NewMessage(pattern=r'/backtest'))
+async def cmd_backtest(event):
+    """
+    /backtest [offsets] [backup_offsets] [all] [table] : backtest de la règle sur
+    l'historique des jeux de la table (base d'état, ou journal BACKTEST_LOG_PATH
+    s'il est défini), un job par décalage de cible dans le pool de processus.
+    Les résultats sont envoyés au fur et à mesure.
+    """
+    if event.is_group or event.is_channel: return
+    if await reject_non_admin(event): return
+    if not BACKTEST_LOG_PATH and not store.enabled:
+        await event.respond("❌ Historique indisponible (STATE_DB_PATH et BACKTEST_LOG_PATH vides)")
+        return
+
+    args = event.message.message.split()[1:]
+    mapping_kind = 'all' if 'all' in args else 'current'
+    by_name = {t.name: t for t in tables}
+    table = next((by_name[a] for a in args if a in by_name), tables[0])
+    specs = [a for a in args if a != 'all' and a not in by_name]
+    offsets_spec = specs[0] if specs else str(table.strategy.target_offset)
+    backup_spec = specs[1] if len(specs) > 1 else str(table.backup_offset)
+
+    await event.respond(f"⏳ Backtest lancé ({table.name}, N+{offsets_spec}, backup +{backup_spec}, mappings: {mapping_kind})")
+    started = perf_counter()
+    try:
+        n_games, offsets, backup_offsets, padding, masks, present = await jobs.run(
+            'backtest:historique', history_job, STATE_DB_PATH, table.name, offsets_spec, backup_spec,
+            BACKTEST_LOG_PATH, table.source_channel_id)
+    except Exception as e:
+        await event.respond(f"❌ Backtest impossible: {e}")
+        return
+    if not n_games:
+        await event.respond(f"❌ Aucun jeu dans l'historique de la table {table.name}")
+        return
+
+    runs = [
+        asyncio.ensure_future(jobs.run(f"backtest:N+{offset}", backtest_job, masks, present, padding,
+                                       offset, backup_offsets, mapping_kind, 3))
+        for offset in offsets
+    ]
+    best = []
+    for done in asyncio.as_completed(runs):
+        try:
+            offset, results, table_text = await done
+        except Exception as e:
+            outbound.send_message(event.chat_id, f"❌ Job de backtest en échec: {e}")
+            continue
+        best.extend(results)
+        outbound.send_message(event.chat_id, f"📊 **N+{offset}** ({n_games} jeux)\n```\n{table_text}\n```")
+
+    if best:
+        top = max(best, key=lambda r: r['hit_rate'])
+        outbound.send_message(event.chat_id, (
+            f"🏁 Backtest terminé en {perf_counter() - started:.1f}s - meilleure variante: "
+            f"mapping {top['mapping']}, N+{top['offset']}, backup +{top['backup_offset']} "
+            f"({top['hit_rate']:.1%}, avec backup {top['combined_hit_rate']:.1%})"
+        ))
+
+@client.on(events.NewMessage(pattern=r'/export'))
+async def cmd_export(event):
+    """/export [xlsx|csv] [table] : historique des jeux et des prédictions, généré hors du bot puis envoyé en fichier."""
+    if event.is_group or event.is_channel: return
+    if await reject_non_admin(event): return
+    if not store.enabled:
+        await event.respond("❌ Historique indisponible (STATE_DB_PATH vide)")
+        return
+
+    args = event.message.message.split()[1:]
+    fmt = 'csv' if 'csv' in args else 'xlsx'
+    names = {t.name for t in tables}
+    table_name = next((a for a in args if a in names), None)
+
+    await event.respond(f"⏳ Export {fmt.upper()} en cours{f' ({table_name})' if table_name else ''}...")
+    out_dir = tempfile.mkdtemp(prefix='export_')
+    try:
+        files = await jobs.run(f"export:{fmt}", export_job, STATE_DB_PATH, fmt, out_dir, table_name)
+        for path, rows in files:
+            # Téléversement par parties de 512 Ko lues depuis le disque
+            await client.send_file(event.chat_id, path, caption=f"📦 {os.path.basename(path)} - {rows} lignes",
+                                   force_document=True, part_size_kb=512)
+    except Exception as e:
+        logger.error("Erreur export: %s", e)
+        await event.respond(f"❌ Export impossible: {e}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+@client.on(events.NewMessage(pattern='/help'))
+async def cmd_help(event):
+    if event.is_group or event.is_channel: return
+    await event.respond(f"""📖 **Aide - Bot de Prédiction**\n\n**Règle de prédiction (Paire N et N+1):**\n• Condition: L'union des couleurs du premier groupe du jeu **N** et du jeu **N+1** doit avoir **exactement 3 couleurs** (1 manquante).\n• La couleur manquante est convertie par le mapping de la table, puis prédite sur un jeu futur.\n\n{''.join(_help_table(t) for t in tables)}\n**Règles de Stockage/Envoi:**\n1. Au-delà du stock actif de la table (**Max**), les prédictions attendent en file.\n2. Envoi depuis la file d'attente **uniquement** à la distance d'envoi de la table.\n3. Toute prédiction atteignant la distance **1 ou 0** dans la file est **supprimée**.\n\n**Maintenance:**\n• Quand le compteur de jeux repart de #1, les prédictions en cours sont vérifiées sur le nouveau cycle (numéro publié inchangé) ; si des jeux manquent entre les deux cycles, elles expirent.\n• Reset complet planifié: {f'**{DAILY_RESET_TIME} WAT**' if DAILY_RESET_TIME else 'désactivé'}.\n""")
+
+def _help_table(table) -> str:
+    """Réglages d'une table pour /help (mapping, cible, stock actif, distance d'envoi, backup)."""
+    mapping = ', '.join(f"{SUIT_DISPLAY[k]}→{SUIT_DISPLAY[v]}" for k, v in table.strategy.mapping.items())
+    distances = [str(d) for d in range(table.proximity_threshold, 1, -1)] or ['2']
+    distances = ' ou '.join(filter(None, (', '.join(distances[:-1]), distances[-1])))
+    return (
+        f"🎲 **Table {table.name}:**\n"
+        f"• Mapping (manquante → prédite): {mapping}\n"
+        f"• Prédit: Jeu **N+1 + {table.strategy.target_offset}** avec la couleur mappée.\n"
+        f"• Max **{table.max_pending}** actives, envoi à distance **{distances}** jeux.\n"
+        f"• Après un ❌, backup sur le jeu **cible + {table.backup_offset}**.\n"
+        f"• Jeux récents et prédictions restées sans résultat expirés après **{table.game_window} jeux**.\n"
+    )
+
+
+# --- Serveur Web et Démarrage ---
+
+def _pending_json(table):
+    return [
+        {'game': pred.display_game, 'suit': SUIT_SYMBOLS[pred.suit], 'status': pred.status,
+         'check_count': pred.check_count, 'base_game': pred.base_game,
+         'backup_game': pred.backup_game, 'created_at': pred.created_at}
+        for _, pred in sorted(table.pending_predictions.items())
+    ]
+
+def _queued_json(table):
+    return [
+        {'game': pred.display_game, 'suit': SUIT_SYMBOLS[pred.suit], 'base_game': pred.base_game,
+         'queued_at': pred.created_at}
+        for _, pred in sorted(table.queued_predictions.items())
+    ]
+
+def _game_json(table):
+    last = table.last_processed_game_data
+    return {'table': table.name, 'current_game': table.current_game_number,
+            'last_game': last['game_number'] if last else None,
+            'last_first_group': last['first_group'] if last else None}
+
+def _state_json():
+    return {
+        'version': feed.version,
+        'tables': [
+            dict(_game_json(t), source=t.source_channel_id, prediction=t.prediction_channel_id,
+                 pending=_pending_json(t), queued=_queued_json(t), recent_outcomes=t.recent_outcomes.latest(50),
+                 stats=dict(t.rolling.summaries()))
+            for t in tables
+        ],
+    }
+
+API_VIEWS = {
+    'state': _state_json,
+    'game': lambda: [_game_json(t) for t in tables],
+    'predictions': lambda: [{'table': t.name, 'pending': _pending_json(t), 'queued': _queued_json(t)} for t in tables],
+    'outcomes': lambda: [{'table': t.name, 'outcomes': t.recent_outcomes.latest()} for t in tables],
+}
+
+async def api_view(request):
+    """/api/{state,game,predictions,outcomes} : JSON servi depuis le cache, ETag = démarrage et version de l'état."""
+    view = request.match_info['view']
+    build = API_VIEWS.get(view)
+    if build is None:
+        raise web.HTTPNotFound()
+    etag = feed.etag()
+    if request.headers.get('If-None-Match') == etag:
+        return web.Response(status=304, headers={'ETag': etag})
+    body = feed.cached(view, lambda: json.dumps(build(), ensure_ascii=False).encode())
+    return web.Response(body=body, content_type='application/json', charset='utf-8',
+                        headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+async def api_events(request):
+    """/api/events : flux SSE, état complet à la connexion puis chaque jeu et changement de prédiction."""
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'
+    })
+    await response.prepare(request)
+    queue = feed.subscribe()
+    try:
+        state = feed.cached('state', lambda: json.dumps(_state_json(), ensure_ascii=False).encode())
+        await response.write(b"retry: 5000\nid: %d\nevent: state\ndata: %s\n\n" % (feed.version, state))
+        while feed.is_subscribed(queue):
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=15)
+            except asyncio.TimeoutError:
+                message = b": ping\n\n"
+            await response.write(message)
+    except ConnectionResetError:
+        pass
+    finally:
+        feed.unsubscribe(queue)
+    return response
+
+async def index(request):
+    return web.Response(body=feed.cached('index', _render_index), content_type='text/html', charset='utf-8', status=200)
+
+def _render_index() -> bytes:
+    games = ''
+    for t in tables:
+        games += f"<h2>{t.name}</h2><p><strong>Jeu actuel:</strong> #{t.current_game_number}</p>"
+        games += "<table border='1' cellpadding='4'><tr><th>Fenêtre</th><th>Jeux</th>" \
+                 + ''.join(f"<th>{SUIT_DISPLAY[s]}</th>" for s in SUIT_DISPLAY) \
+                 + "<th>Règle</th><th>✅0️⃣</th><th>✅1️⃣</th><th>❌</th><th>Supprimées</th><th>Réussite</th></tr>"
+        for window, summary in t.rolling.summaries():
+            o = summary['outcomes']
+            games += f"<tr><td>{window}</td><td>{summary['games']}</td>" \
+                     + ''.join(f"<td>{summary['suit_rates'][s]:.1%}</td>" for s in SUIT_DISPLAY) \
+                     + f"<td>{summary['trigger_rate']:.1%}</td><td>{o['✅0️⃣']}</td><td>{o['✅1️⃣']}</td>" \
+                     + f"<td>{o['❌']}</td><td>{o['supprimée']}</td><td>{summary['hit_rate']:.1%}</td></tr>"
+        games += "</table>"
+    html = f"""<!DOCTYPE html><html><head><title>Bot Prédiction Baccarat</title></head><body><h1>🎯 Bot de Prédiction Baccarat</h1><p>Le bot est en ligne et surveille les canaux.</p>{games}</body></html>"""
+    return html.encode()
+
+async def health_check(request):
+    return web.Response(text="OK", status=200)
+
+async def ready_check(request):
+    """Prêt : état restauré, Telegram connecté et rattrapage terminé (503 sinon, avec les étapes atteintes)."""
+    ready = 'catch_up' in startup and client.is_connected()
+    return web.json_response({'ready': ready, 'startup_s': startup}, status=200 if ready else 503)
+
+async def metrics_endpoint(request):
+    return web.Response(text=REGISTRY.render(), content_type='text/plain', charset='utf-8',
+                        headers={'X-Content-Type-Options': 'nosniff'}, status=200)
+
+async def start_web_server():
+    """Démarre le serveur web pour la vérification de l'état (health check)."""
+    app = web.Application()
+    app.router.add_get('/', index)
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/ready', ready_check)
+    app.router.add_get('/metrics', metrics_endpoint)
+    app.router.add_get('/api/events', api_events)
+    app.router.add_get('/api/{view}', api_view)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', PORT)
+    await site.start() 
+
+def daily_reset():
+    """Efface l'état de prédiction de toutes les tables et la déduplication."""
+    for table in tables:
+        table.reset()
+    processed_messages.clear()
+    last_transferred_game.clear()
+
+async def schedule_daily_reset():
+    """Reset complet quotidien à DAILY_RESET_TIME (WAT), en secours de l'expiration par numéro de jeu."""
+    wat_tz = timezone(timedelta(hours=1)) 
+    hour, minute = (int(part) for part in DAILY_RESET_TIME.split(':'))
+    reset_time = time(hour, minute, tzinfo=wat_tz)
+
+    logger.info("Tâche de reset planifiée pour %s WAT.", reset_time)
+
+    while True:
+        now = datetime.now(wat_tz)
+        target_datetime = datetime.combine(now.date(), reset_time, tzinfo=wat_tz)
+        if now >= target_datetime:
+            target_datetime += timedelta(days=1)
+            
+        time_to_wait = (target_datetime - now).total_seconds()
+
+        logger.info("Prochain reset dans %s", timedelta(seconds=time_to_wait))
+        await asyncio.sleep(time_to_wait)
+
+        logger.warning("🚨 RESET QUOTIDIEN À %s WAT DÉCLENCHÉ!", DAILY_RESET_TIME)
+        daily_reset()
+        logger.warning("✅ Toutes les données de prédiction ont été effacées.")
+
+def restore_state(snapshot: dict):
+    """Recharge l'état persisté (prédictions, file d'attente, jeux récents, progression)."""
+    for table in tables:
+        table.restore(snapshot)
+        logger.info("État restauré [%s]: %s actives, %s en file, %s jeux récents, jeu actuel #%s",
+                    table.name, len(table.pending_predictions), len(table.queued_predictions),
+                    len(table.recent_games), table.current_game_number)
+
+    sources = snapshot.get('meta', {}).get('sources')
+    if sources:
+        last_transferred_game.update({int(k): v for k, v in sources['last_transferred_game'].items()})
+        last_source_message_ids.update({int(k): v for k, v in sources['last_source_message_ids'].items()})
+
+    for source_id, source_tables in tables_by_source.items():
+        sequencer.restore(source_id, max(t.current_game_number for t in source_tables),
+                          last_source_message_ids.get(source_id, 0))
+    feed.invalidate()
+
+async def catch_up_source_history():
+    """
+    Rejoue, dans l'ordre, les messages finalisés de chaque canal source publiés
+    depuis le dernier message traité. Les messages sont demandés par pages
+    d'identifiants (autorisé pour un bot, contrairement à l'historique). Les
+    prédictions dont la fenêtre d'envoi est passée ne sont pas envoyées et
+    aucun transfert admin n'est fait.
+    """
+    replayed = 0
+    for source_id, source_tables in tables_by_source.items():
+        last_id = last_source_message_ids.get(source_id, 0)
+        catching_up.add(source_id)
+        for table in source_tables:
+            table.hold_sends = True
+        started = datetime.now()
+        count = 0
+        next_id = last_id + 1
+        try:
+            if not last_id:
+                logger.info("Rattrapage ignoré pour %s: aucun message source traité auparavant", source_id)
+            while last_id and next_id - last_id <= CATCHUP_MAX_MESSAGES:
+                ids = list(range(next_id, next_id + CATCHUP_PAGE_SIZE))
+                page = [m for m in await client.get_messages(source_id, ids=ids) if m is not None]
+                if not page:
+                    break
+                for msg in page:
+                    if msg.message and is_message_finalized(msg.message):
+                        await process_finalized_message(msg.message, source_id, msg.id)
+                        count += 1
+                next_id += CATCHUP_PAGE_SIZE
+        except Exception as e:
+            logger.error("❌ Erreur rattrapage du canal source %s: %s", source_id, e)
+        finally:
+            # Jeux rejoués encore en attente d'un numéro manquant : traités avant la reprise des envois
+            await sequencer.flush(source_id)
+            catching_up.discard(source_id)
+            for table in source_tables:
+                table.hold_sends = False
+
+        # Événements reçus en direct pendant le rattrapage, dans l'ordre des messages
+        buffered = sorted((item for item in catchup_buffer if item[1] == source_id), key=lambda item: item[2])
+        catchup_buffer[:] = [item for item in catchup_buffer if item[1] != source_id]
+        for message_text, chat_id, message_id in buffered:
+            await process_finalized_message(message_text, chat_id, message_id)
+
+        # Envoi des prédictions encore dans leur fenêtre par rapport au jeu réel
+        for table in source_tables:
+            await table.check_and_send_queued_predictions(table.current_game_number)
+
+        elapsed = (datetime.now() - started).total_seconds()
+        logger.info("🔄 Rattrapage de %s terminé: %s jeux rejoués en %.2fs", source_id, count, elapsed)
+        replayed += count
+    return replayed
+
+async def find_missed_messages(source_id: int) -> int:
+    """
+    Messages finalisés publiés après le dernier traité et jamais vus : une page
+    d'identifiants relue par canal source, même requête que le rattrapage.
+    """
+    last_id = last_source_message_ids.get(source_id, 0)
+    if not last_id:
+        return 0
+    ids = list(range(last_id + 1, last_id + 1 + CATCHUP_PAGE_SIZE))
+    return sum(
+        1 for msg in await client.get_messages(source_id, ids=ids)
+        if msg is not None and msg.message and is_message_finalized(msg.message)
+        and (source_id, msg.id, hash(msg.message)) not in processed_messages
+    )
+
+async def watch_missed_messages(interval: float):
+    """
+    Relance le rattrapage quand des messages finalisés ont été manqués.
+    Telethon se reconnecte seul sans le signaler (is_connected() reste vrai) et
+    les mises à jour reçues pendant la coupure sont perdues : seule la
+    comparaison avec les messages du canal source permet de les détecter.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            missed = {source_id: await find_missed_messages(source_id) for source_id in tables_by_source}
+        except Exception as e:
+            logger.warning("⚠️ Recherche de messages manqués impossible: %s", e)
+            continue
+        if any(missed.values()):
+            logger.warning("🔌 %s messages finalisés manqués, rattrapage des canaux source", sum(missed.values()))
+            CATCHUP_RUNS.inc()
+            await catch_up_source_history()
+
+def save_session():
+    """Enregistre la session Telegram pour le prochain démarrage si elle est nouvelle (jamais envoyée ni journalisée)."""
+    current = client.session.save()
+    if not current or current == session_string:
+        return
+    store.put('meta', 'telegram_session', current)
+    if not os.getenv('TELEGRAM_SESSION'):
+        logger.info("🔑 Nouvelle session Telegram enregistrée dans STATE_DB_PATH. Si le disque est effacé à chaque "
+                    "déploiement, le bot s'authentifie de nouveau avec BOT_TOKEN ; TELEGRAM_SESSION peut l'éviter.")
+
+async def start_bot():
+    """Démarre le client Telegram et les vérifications initiales."""
+    global source_channel_ok
+    try:
+        await client.start(bot_token=BOT_TOKEN)
+        
+        source_channel_ok = True
+        for table in tables:
+            table.prediction_channel_ok = True
+        logger.info("Bot connecté et canaux marqués comme accessibles.")
+        return True
+    except Exception as e:
+        logger.error("Erreur démarrage du client Telegram: %s", e)
+        return False
+
+async def main():
+    """Fonction principale pour lancer le serveur web, le bot et la tâche de reset."""
+    if not check_config():
+        exit(1)
+    mark_startup('imports')
+    try:
+        # Événements en direct mis de côté jusqu'à la restauration de l'état et la fin du rattrapage
+        catching_up.update(tables_by_source)
+
+        async def open_store():
+            snapshot = await asyncio.to_thread(store.open)
+            restore_state(snapshot)
+            mark_startup('state_restored')
+
+        async def open_web_server():
+            await start_web_server()
+            mark_startup('web_server')
+
+        # Lecture de l'état, ouverture du port web et connexion Telegram en parallèle
+        _, _, success = await asyncio.gather(open_store(), open_web_server(), start_bot())
+        if not success:
+            logger.error("Échec du démarrage du bot")
+            return
+        mark_startup('telegram_connected')
+        save_session()
+
+        # Jeux publiés pendant l'arrêt, puis surveillance des messages manqués (reconnexions)
+        await catch_up_source_history()
+        mark_startup('catch_up')
+        if CATCHUP_CHECK_INTERVAL > 0:
+            asyncio.create_task(watch_missed_messages(CATCHUP_CHECK_INTERVAL))
+
+        asyncio.create_task(monitor_event_loop_lag(guard=loop_guard))
+
+        # Reset complet planifié, seulement s'il est configuré
+        if DAILY_RESET_TIME:
+            asyncio.create_task(schedule_daily_reset())
+        
+        logger.info("Bot complètement opérationnel - En attente de messages...")
+        await client.run_until_disconnected()
+
+    except Exception as e:
+        logger.error("Erreur dans main: %s", e)
+        import traceback
+        logger.error(traceback.format_exc())
+    finally:
+        try:
+            await sequencer.flush()
+            await asyncio.wait_for(outbound.drain(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ File sortante non vidée avant l'arrêt")
+        store.close()
+        jobs.shutdown()
+        if client.is_connected():
+            await client.disconnect()
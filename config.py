@@ -1,16 +1,19 @@
 """
 Configuration du bot Telegram de prédiction Baccarat
 """
+import json
 import os
 
-def parse_channel_id(env_var: str, default: str) -> int:
-    value = os.getenv(env_var) or default
+def normalize_channel_id(value) -> int:
     channel_id = int(value)
     # Convertit l'ID positif en format ID de canal Telegram négatif si nécessaire
     if channel_id > 0 and len(str(channel_id)) >= 10:
         channel_id = -channel_id
     return channel_id
 
+def parse_channel_id(env_var: str, default: str) -> int:
+    return normalize_channel_id(os.getenv(env_var) or default)
+
 # ID du canal source (inchangé)
 SOURCE_CHANNEL_ID = parse_channel_id('SOURCE_CHANNEL_ID', '-1002682552255')
 
@@ -25,6 +28,56 @@ BOT_TOKEN = os.getenv('BOT_TOKEN') or ''
 
 PORT = int(os.getenv('PORT') or '5000')  # Port 5000 for Replit
 
+# Taille du cache de déduplication des messages finalisés et de l'historique des jeux
+DEDUP_CACHE_SIZE = int(os.getenv('DEDUP_CACHE_SIZE') or '2000')
+RECENT_GAMES_SIZE = int(os.getenv('RECENT_GAMES_SIZE') or '100')
+# Prédictions terminées conservées en mémoire par table (API /api/outcomes) : au moins une journée
+OUTCOME_HISTORY_SIZE = int(os.getenv('OUTCOME_HISTORY_SIZE') or '4096')
+
+# Délai minimal (secondes) entre deux appels Telegram vers un même chat
+OUTBOUND_MIN_INTERVAL = float(os.getenv('OUTBOUND_MIN_INTERVAL') or '1.0')
+
+# Fichier SQLite de persistance de l'état (vide pour désactiver)
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'bot_state.db')
+
+# Rattrapage après redémarrage/reconnexion : nombre maximal de messages relus et taille des pages
+CATCHUP_MAX_MESSAGES = int(os.getenv('CATCHUP_MAX_MESSAGES') or '2000')
+CATCHUP_PAGE_SIZE = 100
+# Intervalle (secondes) de la recherche de messages finalisés manqués (mises à jour perdues pendant une
+# reconnexion automatique de Telethon), qui relance le rattrapage ; 0 pour désactiver
+CATCHUP_CHECK_INTERVAL = float(os.getenv('CATCHUP_CHECK_INTERVAL') or '60')
+
+# Attente maximale (secondes) d'un jeu manquant avant de traiter les jeux suivants déjà reçus
+SEQUENCER_TIMEOUT = float(os.getenv('SEQUENCER_TIMEOUT') or '3.0')
+
+# Cycle de vie de l'état piloté par les numéros de jeu : les entrées de plus de GAME_WINDOW jeux
+# (jeux récents, prédictions actives restées sans résultat) expirent à chaque jeu finalisé. Dans un
+# message plus récent que les précédents, un retour à #1 ou un recul de plus de ROLLOVER_GAP signale
+# un nouveau cycle du compteur de la source ; une avance de plus de ROLLOVER_GAP, une reprise sans
+# attendre les numéros intermédiaires (voir GameSequencer)
+GAME_WINDOW = int(os.getenv('GAME_WINDOW') or '100')
+ROLLOVER_GAP = int(os.getenv('ROLLOVER_GAP') or '100')
+
+# Reset complet planifié (HH:MM, heure WAT), en secours seulement : désactivé si vide
+DAILY_RESET_TIME = os.getenv('DAILY_RESET_TIME', '').strip()
+
+# Pool de processus pour les calculs lourds (backtests, exports) et budget d'occupation de la boucle
+JOB_WORKERS = int(os.getenv('JOB_WORKERS') or '2')
+HANDLER_BUDGET_MS = float(os.getenv('HANDLER_BUDGET_MS') or '10')
+
+# /backtest : historique des jeux de la base d'état (STATE_DB_PATH), ou ce journal des messages source
+# (format du mode replay) s'il est défini
+BACKTEST_LOG_PATH = os.getenv('BACKTEST_LOG_PATH', '')
+
+# Journalisation : format ('json' ou 'text'), niveau, limite de lignes identiques
+# (même modèle de message) par fenêtre de LOG_RATE_WINDOW secondes (0 = sans limite)
+# et taille de la file vers le thread d'écriture
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT') or '20')
+LOG_RATE_WINDOW = float(os.getenv('LOG_RATE_WINDOW') or '10')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE') or '10000')
+
 # NOUVEAU MAPPING : Échange des enseignes de même couleur (Noir/Noir et Rouge/Rouge)
 # Note : Les variantes multiples (♠️, ♥, etc.) du mapping précédent ont été retirées 
 # pour simplifier, car elles sont gérées par SUIT_DISPLAY et ALL_SUITS.
@@ -36,9 +89,51 @@ SUIT_MAPPING = {
 }
 
 ALL_SUITS = ['♠', '♥', '♦', '♣']
+# Représentation compacte : un bit par couleur (masque 4 bits)
+SUIT_BITS = {
+    '♠': 1,
+    '♥': 2,
+    '♦': 4,
+    '♣': 8
+}
+ALL_SUITS_MASK = 0b1111
+SUIT_SYMBOLS = {bit: suit for suit, bit in SUIT_BITS.items()}
+
+def build_prediction_lut(mapping: dict) -> tuple:
+    """
+    Table de 16 entrées indexée par le masque combiné des jeux N et N+1 :
+    bit de la couleur prédite si exactement une couleur manque, sinon 0.
+    """
+    lut = [0] * 16
+    for suit, bit in SUIT_BITS.items():
+        lut[ALL_SUITS_MASK ^ bit] = SUIT_BITS[mapping.get(suit, suit)]
+    return tuple(lut)
 SUIT_DISPLAY = {
     '♠': '♠️',
     '♥': '❤️',
     '♦': '♦️',
     '♣': '♣️'
 }
+
+def load_tables() -> list:
+    """
+    Tables servies par le bot (canal source -> canal de prédiction), depuis la
+    variable TABLES en JSON, par exemple :
+    [{"name": "A", "source": -1001, "prediction": -1002},
+     {"name": "B", "source": -1003, "prediction": -1004, "target_offset": 7,
+      "max_pending": 3, "proximity_threshold": 3, "backup_offset": 9,
+      "strategy": "pair_rule", "mapping": {"♠": "♥", "♥": "♠", "♦": "♣", "♣": "♦"}}]
+    Sans TABLES, une seule table est créée depuis SOURCE_CHANNEL_ID / PREDICTION_CHANNEL_ID.
+    """
+    raw = os.getenv('TABLES')
+    if not raw:
+        return [{'name': 'principal', 'source': SOURCE_CHANNEL_ID, 'prediction': PREDICTION_CHANNEL_ID}]
+
+    tables = json.loads(raw)
+    for index, table in enumerate(tables, 1):
+        table.setdefault('name', f"table{index}")
+        table['source'] = normalize_channel_id(table['source'])
+        table['prediction'] = normalize_channel_id(table['prediction'])
+    return tables
+
+TABLES = load_tables()
@@ -0,0 +1,87 @@
+"""
+Structures bornées pour la déduplication et l'historique récent.
+
+`DedupCache` retient les derniers messages finalisés traités (ensemble LRU)
+et `BoundedDict` les derniers jeux d'une table ; au-delà de leur capacité,
+l'entrée la plus ancienne est évincée en O(1).
+"""
+from collections import OrderedDict
+
+
+class DedupCache:
+    """Ensemble LRU de taille fixe avec statistiques hits/misses/évictions."""
+
+    __slots__ = ('capacity', '_entries', 'hits', 'misses', 'evictions')
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity doit être >= 1")
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def seen(self, key) -> bool:
+        """Retourne True si la clé est déjà connue, sinon l'enregistre et retourne False."""
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        entries[key] = None
+        if len(entries) > self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return False
+
+    def __contains__(self, key) -> bool:
+        """Consultation sans effet sur l'ordre ni sur les statistiques."""
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class BoundedDict(OrderedDict):
+    """Dictionnaire ordonné par insertion qui évince l'entrée la plus ancienne au-delà de `capacity`."""
+
+    def __init__(self, capacity: int, on_evict=None):
+        if capacity < 1:
+            raise ValueError("capacity doit être >= 1")
+        super().__init__()
+        self.capacity = capacity
+        self.on_evict = on_evict
+        self.evictions = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if len(self) > self.capacity:
+            evicted, _ = self.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+
+    def expire(self, predicate) -> int:
+        """Évince, depuis la plus ancienne, les entrées dont la clé vérifie `predicate` ; retourne leur nombre."""
+        count = 0
+        while self and predicate(next(iter(self))):
+            evicted, _ = self.popitem(last=False)
+            count += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+        return count
@@ -0,0 +1,487 @@
+"""
+Moteur de prédiction multi-tables.
+
+Une table associe un canal source à un canal de prédiction avec son propre
+état (prédictions actives, file d'attente, jeux récents, jeu N en attente de
+N+1) et sa stratégie. Un même processus sert toutes les tables ; bot.py
+retrouve les tables d'un chat en O(1) via `index_by_source`.
+
+Le cycle de vie de l'état suit les numéros de jeu : à chaque jeu finalisé,
+les entrées sorties de la fenêtre de `game_window` jeux expirent. Quand le
+compteur de la source repart de #1 (nouveau cycle, reconnu par le
+séquenceur), les prédictions en cours sont renumérotées sur le nouveau cycle
+sans changer le numéro publié ; si des jeux ont été manqués entre les deux
+cycles, elles expirent.
+"""
+import logging
+from datetime import datetime
+
+from config import (SUIT_MAPPING, SUIT_BITS, SUIT_SYMBOLS, ALL_SUITS_MASK, RECENT_GAMES_SIZE, OUTCOME_HISTORY_SIZE,
+                    GAME_WINDOW, build_prediction_lut)
+from dedup import BoundedDict
+from metrics import REGISTRY
+from records import PredictionRecord, OutcomeRing
+from scheduler import TargetQueue
+from rolling_stats import RollingStats
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ('✅0️⃣', '✅1️⃣', '❌')
+
+
+# --- Stratégies ---
+
+class PairRuleStrategy:
+    """
+    Règle de paire N/N+1 : si l'union des couleurs du premier groupe des jeux N
+    et N+1 a exactement 3 couleurs, la couleur manquante mappée est prédite
+    sur le jeu N+1 + target_offset.
+    """
+    name = 'pair_rule'
+
+    def __init__(self, mapping: dict = None, target_offset: int = 9):
+        self.mapping = dict(mapping or SUIT_MAPPING)
+        self.lut = build_prediction_lut(self.mapping)
+        self.mask_mapping = {SUIT_BITS[k]: SUIT_BITS[v] for k, v in self.mapping.items()}
+        self.target_offset = target_offset
+
+    def predict(self, previous_mask: int, current_mask: int) -> int:
+        """Bit de la couleur prédite, ou 0 si la règle ne s'applique pas."""
+        return self.lut[previous_mask | current_mask]
+
+    def alternate(self, suit: int) -> int:
+        """Couleur du backup après un échec (mapping appliqué à la couleur prédite)."""
+        return self.mask_mapping.get(suit, suit)
+
+
+STRATEGIES = {
+    PairRuleStrategy.name: PairRuleStrategy,
+}
+
+
+# --- Table ---
+
+class PredictionTable:
+    """État et logique de prédiction d'une paire canal source -> canal de prédiction."""
+
+    def __init__(self, name: str, source_channel_id: int, prediction_channel_id: int, strategy,
+                 outbound, store, max_pending: int = 2, proximity_threshold: int = 3,
+                 backup_offset: int = 9, recent_size: int = RECENT_GAMES_SIZE,
+                 outcome_history: int = OUTCOME_HISTORY_SIZE, game_window: int = GAME_WINDOW):
+        self.name = name
+        self.source_channel_id = source_channel_id
+        self.prediction_channel_id = prediction_channel_id
+        self.strategy = strategy
+        self.outbound = outbound
+        self.store = store
+        self.max_pending = max_pending                  # Nombre maximal de prédictions actives
+        self.proximity_threshold = proximity_threshold  # Envoi depuis la file à distance 3 ou 2
+        self.backup_offset = backup_offset              # Décalage du backup après le jeu cible
+        self.game_window = game_window                  # Âge maximal (en jeux) des entrées conservées
+        # Nom de la table joint à chaque ligne (champ 'table' du journal JSON, préfixe en texte)
+        self.log = logging.LoggerAdapter(logger, {'table': name})
+
+        # Prédictions actives (déjà envoyées au canal de prédiction) : jeu cible -> PredictionRecord
+        self.pending_predictions = {}
+        # Prédictions en attente (prêtes à être envoyées dès que la distance est bonne), triées par jeu cible
+        self.queued_predictions = TargetQueue()
+        self.recent_games = BoundedDict(recent_size, on_evict=lambda game: store.delete(self.ns('recent'), game))
+        # Jeu N en attente de N+1
+        self.last_processed_game_data = None
+        self.current_game_number = 0
+
+        self.prediction_channel_ok = False
+        # Rattrapage en cours : aucun envoi depuis la file d'attente
+        self.hold_sends = False
+
+        # Fréquences des couleurs, déclenchements de la règle et résultats sur 100/1000 jeux et 24 h
+        self.rolling = RollingStats()
+        # Prédictions terminées (API JSON) : une journée de résultats dans un tampon circulaire compact
+        self.recent_outcomes = OutcomeRing(outcome_history)
+        # Rappel on_event(type, données) à chaque jeu finalisé et changement de prédiction (flux en direct)
+        self.on_event = None
+        self.lifecycle = {'rollovers': 0, 'expired_predictions': 0, 'expired_games': 0}
+
+        self.outcomes = {
+            status: REGISTRY.counter('bot_predictions_total', "Prédictions terminées par résultat",
+                                     table=name, outcome=outcome)
+            for status, outcome in (('✅0️⃣', 'hit_0'), ('✅1️⃣', 'hit_1'), ('❌', 'miss'), ('dropped', 'dropped'))
+        }
+
+    def ns(self, kind: str) -> str:
+        """Espace de noms de persistance propre à la table."""
+        return f"{self.name}:{kind}"
+
+    def message_key(self, game_number: int):
+        return ('prediction', self.name, game_number)
+
+    def _emit(self, event_type: str, **data):
+        if self.on_event is not None:
+            data['table'] = self.name
+            self.on_event(event_type, data)
+
+    def _finish(self, game_number: int, suit: int, status: str):
+        """Prédiction terminée (résultat ou suppression) : statistiques, derniers résultats et événement."""
+        self.rolling.record_outcome(status)
+        self.recent_outcomes.append(game_number, suit, status)
+        self._emit('prediction', game=game_number, suit=SUIT_SYMBOLS[suit], status=status)
+
+    # --- Logique de Prédiction et File d'Attente ---
+
+    async def send_prediction_to_channel(self, target_game: int, predicted_suit: int, base_game: int):
+        """Envoie la prédiction au canal de prédiction et l'ajoute aux prédictions actives."""
+        try:
+            prediction_msg = f"""😼 {target_game}😺: √{SUIT_SYMBOLS[predicted_suit]} statut :🔮"""
+
+            pred = PredictionRecord(target_game, predicted_suit, base_game,
+                                    alternate_suit=self.strategy.alternate(predicted_suit),
+                                    backup_game=target_game + self.backup_offset, status='🔮')
+            self.pending_predictions[target_game] = pred
+            self.store.put(self.ns('pending'), target_game, pred.to_dict())
+            self._emit('prediction', game=target_game, suit=SUIT_SYMBOLS[predicted_suit], status='🔮')
+
+            if self.prediction_channel_id and self.prediction_channel_ok:
+                # Envoi non bloquant : l'identifiant du message est renseigné à la publication
+                def on_sent(msg_id):
+                    pred.message_id = msg_id
+                    # Numéro relu sur l'enregistrement : il a pu être renuméroté entre-temps
+                    if self.pending_predictions.get(pred.target_game) is pred:
+                        self.store.put(self.ns('pending'), pred.target_game, pred.to_dict())
+                    self.log.info("✅ Prédiction #%s envoyée au canal de prédiction %s", target_game, self.prediction_channel_id)
+
+                self.outbound.send_message(self.prediction_channel_id, prediction_msg,
+                                           key=self.message_key(target_game), on_sent=on_sent)
+            else:
+                self.log.warning("⚠️ Canal de prédiction non accessible, prédiction non envoyée")
+
+            self.log.info("Prédiction active: Jeu #%s - %s (basé sur #%s)", target_game, SUIT_SYMBOLS[predicted_suit], base_game)
+            return True
+
+        except Exception as e:
+            self.log.error("Erreur envoi prédiction: %s", e)
+            return None
+
+    def queue_prediction(self, target_game: int, predicted_suit: int, base_game: int):
+        """Met une prédiction en file d'attente pour un envoi différé (gestion du stock)."""
+        # Vérification d'unicité (pas plus d'une prédiction par numéro de jeu)
+        if target_game in self.queued_predictions or target_game in self.pending_predictions:
+            self.log.info("Prédiction #%s déjà en file ou active, ignorée", target_game)
+            return False
+
+        pred = PredictionRecord(target_game, predicted_suit, base_game)
+        self.queued_predictions[target_game] = pred
+        self.store.put(self.ns('queued'), target_game, pred.to_dict())
+        self._emit('prediction', game=target_game, suit=SUIT_SYMBOLS[predicted_suit], status='en file')
+        self.log.info("📋 Prédiction #%s mise en file d'attente (sera envoyée quand proche)", target_game)
+        return True
+
+    async def check_and_send_queued_predictions(self, current_game: int):
+        """
+        Vérifie la file d'attente, applique la suppression stricte si la fenêtre d'envoi est manquée (distance <= 1),
+        puis envoie si la distance est de 2 ou 3 jeux et que le stock actif le permet.
+        La file est parcourue depuis le jeu cible le plus proche et seulement tant qu'il y a quelque chose à faire.
+        """
+        self.current_game_number = current_game
+        queue = self.queued_predictions
+
+        # Si la prédiction atteint la distance 1 ou 0 sans avoir été envoyée, elle est supprimée.
+        while queue and queue.first() - current_game <= 1:
+            target_game, pred = queue.pop_first()
+            distance = target_game - current_game
+            self.log.warning("⚠️ Prédiction #%s est à une distance %s. Fenêtre d'envoi manquée (devait être > 1). Supprimée.", target_game, distance)
+            self._drop_queued(pred)
+
+        # Envoi uniquement à distance 3 ou 2 ; au-delà la prédiction reste en file
+        while queue and queue.first() - current_game <= self.proximity_threshold:
+            target_game = queue.first()
+            # Vérifie si le stock actif est plein AVANT d'envoyer
+            if len(self.pending_predictions) >= self.max_pending:
+                self.log.info("⏸️ Stock actif plein (%s/%s), prédiction #%s reste en file.", len(self.pending_predictions), self.max_pending, target_game)
+                break
+            if self.hold_sends:
+                # Jeu rejoué : la fenêtre réelle est peut-être déjà passée, l'envoi attend la fin du rattrapage
+                break
+
+            _, pred = queue.pop_first()
+            self.store.delete(self.ns('queued'), target_game)
+            self.log.info("🎯 Jeu #%s - Prédiction #%s proche (%s jeux), envoi maintenant!", current_game, target_game, target_game - current_game)
+
+            await self.send_prediction_to_channel(pred.target_game, pred.suit, pred.base_game)
+
+    async def update_prediction_status(self, game_number: int, new_status: str):
+        """Met à jour le message de prédiction dans le canal et son statut interne."""
+        try:
+            if game_number not in self.pending_predictions:
+                return False
+
+            pred = self.pending_predictions[game_number]
+            updated_msg = f"""😼 {pred.display_game}😺: √{SUIT_SYMBOLS[pred.suit]} statut :{new_status}"""
+
+            if self.prediction_channel_id and self.prediction_channel_ok:
+                # Les éditions successives d'un même message sont fusionnées par la file sortante
+                self.outbound.edit_message(self.prediction_channel_id, self.message_key(game_number),
+                                           updated_msg, message_id=pred.message_id)
+
+            pred.status = new_status
+            self.log.info("Prédiction #%s mise à jour: %s", game_number, new_status)
+
+            # Les prédictions terminées sont supprimées du stock actif (pour faire de la place)
+            if new_status in FINAL_STATUSES:
+                del self.pending_predictions[game_number]
+                self.store.delete(self.ns('pending'), game_number)
+                self.store.append('predictions', (self.name, pred.display_game, pred.suit, pred.base_game,
+                                                  new_status, pred.created_at, datetime.now().isoformat()))
+                self.outcomes[new_status].inc()
+                self._finish(pred.display_game, pred.suit, new_status)
+                self.log.info("Prédiction #%s terminée et supprimée", game_number)
+            else:
+                self.store.put(self.ns('pending'), game_number, pred.to_dict())
+                self._emit('prediction', game=pred.display_game, suit=SUIT_SYMBOLS[pred.suit], status=new_status)
+
+            return True
+
+        except Exception as e:
+            self.log.error("Erreur mise à jour prédiction: %s", e)
+            return False
+
+    async def check_prediction_result(self, game_number: int, first_mask: int):
+        """Vérifie les résultats des prédictions actives (masque des couleurs du premier groupe)."""
+
+        # 1. Vérification du jeu actuel (Jeu Cible N)
+        if game_number in self.pending_predictions:
+            pred = self.pending_predictions[game_number]
+
+            if first_mask & pred.suit:
+                await self.update_prediction_status(game_number, '✅0️⃣')
+                return True
+            else:
+                pred.check_count = 1
+                self.store.put(self.ns('pending'), game_number, pred.to_dict())
+                self._emit('prediction', game=pred.display_game, suit=SUIT_SYMBOLS[pred.suit], status=pred.status,
+                           check_count=1)
+                self.log.info("Prédiction #%s: couleur non trouvée au premier jeu, attente du jeu suivant", game_number)
+                return False
+
+        # 2. Vérification du jeu précédent (Jeu Cible N-1 - 2ème chance)
+        prev_game = game_number - 1
+        if prev_game in self.pending_predictions:
+            pred = self.pending_predictions[prev_game]
+            if pred.check_count >= 1:
+                if first_mask & pred.suit:
+                    await self.update_prediction_status(prev_game, '✅1️⃣')
+                    return True
+                else:
+                    await self.update_prediction_status(prev_game, '❌')
+                    self.log.info("Prédiction #%s échouée (❌) - Envoi du backup", prev_game)
+
+                    self.queue_prediction(pred.backup_game, pred.alternate_suit, pred.base_game)
+                    self.log.info("Backup mis en file: #%s en %s", pred.backup_game, SUIT_SYMBOLS[pred.alternate_suit])
+                    return False
+
+        return None
+
+    async def process_game(self, game_number: int, first_group: str, first_mask: int):
+        """
+        Vérification, envoi depuis la file et règle de prédiction pour un jeu finalisé.
+        Le séquenceur ne laisse passer un numéro inférieur au jeu actuel qu'au
+        début d'un nouveau cycle de la source : c'est alors un retour du compteur.
+        """
+        if game_number < self.current_game_number:
+            self.rollover(game_number)
+        self.current_game_number = game_number
+        self.expire(game_number)
+
+        # --- Vérification des résultats existants ---
+        await self.check_prediction_result(game_number, first_mask)
+
+        # --- Envoi des prédictions en file d'attente (si proche) ---
+        await self.check_and_send_queued_predictions(game_number)
+
+        # --- LOGIQUE DE PRÉDICTION (Paire N et N+1) ---
+        previous = self.last_processed_game_data
+        triggered = False
+        if previous and previous.get('game_number') == game_number - 1:
+            predicted_suit = self.strategy.predict(previous['suits'], first_mask)
+            if predicted_suit:
+                triggered = True
+                missing_suit = ALL_SUITS_MASK ^ (previous['suits'] | first_mask)
+                target_game = game_number + self.strategy.target_offset
+
+                if target_game not in self.pending_predictions and target_game not in self.queued_predictions:
+                    self.log.info("Règle de paire appliquée: N %s & N %s -> Manque %s -> Prédire %s sur #%s (N+%s)", game_number-1, game_number, SUIT_SYMBOLS[missing_suit], SUIT_SYMBOLS[predicted_suit], target_game, self.strategy.target_offset)
+
+                    self.queue_prediction(target_game, predicted_suit, game_number)
+                    await self.check_and_send_queued_predictions(game_number)
+
+        # Stocker le jeu actuel (N+1)
+        self.last_processed_game_data = {
+            'game_number': game_number,
+            'first_group': first_group,
+            'suits': first_mask
+        }
+
+        timestamp = datetime.now().isoformat()
+        self.recent_games[game_number] = {
+            'first_group': first_group,
+            'timestamp': timestamp
+        }
+        self.store.put(self.ns('recent'), game_number, self.recent_games[game_number])
+        self.store.append('games', (self.name, game_number, first_group, first_mask, timestamp))
+        self.rolling.record_game(first_mask, triggered)
+        self._emit('game', game=game_number, first_group=first_group, triggered=triggered)
+        self.store.put(self.ns('meta'), 'progress', {
+            'current_game_number': self.current_game_number,
+            'last_processed_game_data': self.last_processed_game_data
+        })
+
+    # --- Cycle de vie ---
+
+    def expire(self, game_number: int):
+        """Expire les entrées de plus de `game_window` jeux (quelques comparaisons quand rien n'a expiré)."""
+        limit = game_number - self.game_window
+        # Prédiction active sans résultat (jeu cible jamais reçu ou ignoré par le séquenceur)
+        for target_game in [t for t in self.pending_predictions if t < limit]:
+            pred = self._expire_pending(target_game)
+            self.log.warning("⌛ Prédiction #%s sans résultat après %s jeux, expirée", pred.display_game,
+                             game_number - target_game)
+        self.lifecycle['expired_games'] += self.recent_games.expire(lambda game: game < limit)
+
+    def rollover(self, game_number: int):
+        """
+        Nouveau cycle du compteur de jeux de la source (voir GameSequencer). S'il
+        repart de #1, les prédictions en cours sont renumérotées comme si #1
+        suivait directement le dernier jeu traité : celles qui chevauchent le
+        changement de cycle (minuit) sont vérifiées sur les premiers jeux du
+        nouveau cycle et la règle de paire continue ; le numéro publié dans le
+        canal (`display_game`) ne change pas. Si le nouveau cycle commence
+        plus loin, des jeux ont été manqués et l'écart est inconnu : les
+        prédictions actives expirent et celles en file sont supprimées.
+        """
+        last_game = self.current_game_number
+        self.lifecycle['rollovers'] += 1
+        if game_number == 1:
+            self._renumber(last_game + 1 - game_number)
+        else:
+            self.log.warning("🔁 Compteur de jeux passé de #%s à #%s, jeux manqués entre les cycles: "
+                             "%s actives expirées et %s en file supprimées",
+                             last_game, game_number, len(self.pending_predictions), len(self.queued_predictions))
+            for target_game in list(self.pending_predictions):
+                self._expire_pending(target_game)
+            while self.queued_predictions:
+                _, pred = self.queued_predictions.pop_first()
+                self._drop_queued(pred)
+            self.last_processed_game_data = None
+        # Jeux récents de l'ancien cycle : numéros désormais sans rapport avec les nouveaux
+        self.recent_games.clear()
+        self.store.clear(self.ns('recent'))
+
+    def _renumber(self, shift: int):
+        last_game = self.current_game_number
+        self.log.warning("🔁 Compteur de jeux revenu à #1 après #%s: %s actives et %s en file renumérotées",
+                         last_game, len(self.pending_predictions), len(self.queued_predictions))
+
+        pending = list(self.pending_predictions.values())
+        self.pending_predictions.clear()
+        for pred in pending:
+            old_key = self.message_key(pred.target_game)
+            self.store.delete(self.ns('pending'), pred.target_game)
+            pred.target_game -= shift
+            pred.backup_game -= shift
+            pred.base_game -= shift
+            self.pending_predictions[pred.target_game] = pred
+            self.store.put(self.ns('pending'), pred.target_game, pred.to_dict())
+            message_id = self.outbound.message_ids.pop(old_key, None) or pred.message_id
+            if message_id:
+                self.outbound.message_ids[self.message_key(pred.target_game)] = message_id
+
+        queued = list(self.queued_predictions.values())
+        self.queued_predictions.clear()
+        for pred in queued:
+            self.store.delete(self.ns('queued'), pred.target_game)
+            pred.target_game -= shift
+            pred.display_game = pred.target_game  # pas encore publiée : elle le sera sous le nouveau numéro
+            pred.base_game -= shift
+            self.queued_predictions[pred.target_game] = pred
+            self.store.put(self.ns('queued'), pred.target_game, pred.to_dict())
+
+        previous = self.last_processed_game_data
+        if previous and previous.get('game_number') == last_game:
+            previous['game_number'] = last_game - shift
+
+    def _expire_pending(self, target_game: int) -> PredictionRecord:
+        """Prédiction active terminée sans résultat : ⌛ dans le canal, statut 'supprimée'."""
+        pred = self.pending_predictions.pop(target_game)
+        self.store.delete(self.ns('pending'), target_game)
+        if self.prediction_channel_id and self.prediction_channel_ok:
+            self.outbound.edit_message(self.prediction_channel_id, self.message_key(target_game),
+                                       f"😼 {pred.display_game}😺: √{SUIT_SYMBOLS[pred.suit]} statut :⌛",
+                                       message_id=pred.message_id)
+        self.store.append('predictions', (self.name, pred.display_game, pred.suit, pred.base_game,
+                                          'supprimée', pred.created_at, datetime.now().isoformat()))
+        self.outcomes['dropped'].inc()
+        self.lifecycle['expired_predictions'] += 1
+        self._finish(pred.display_game, pred.suit, 'supprimée')
+        return pred
+
+    def _drop_queued(self, pred: PredictionRecord):
+        """Prédiction en file jamais publiée et abandonnée."""
+        self.store.delete(self.ns('queued'), pred.target_game)
+        self.store.append('predictions', (self.name, pred.target_game, pred.suit, pred.base_game,
+                                          'supprimée', pred.created_at, datetime.now().isoformat()))
+        self.outcomes['dropped'].inc()
+        self._finish(pred.target_game, pred.suit, 'supprimée')
+
+    def restore(self, snapshot: dict):
+        """Recharge l'état persisté de la table."""
+        for key, data in snapshot.get(self.ns('pending'), {}).items():
+            pred = PredictionRecord.from_dict(int(key), data, status='🔮')
+            self.pending_predictions[pred.target_game] = pred
+            if pred.message_id:
+                self.outbound.message_ids[self.message_key(pred.target_game)] = pred.message_id
+        for key, data in snapshot.get(self.ns('queued'), {}).items():
+            self.queued_predictions[int(key)] = PredictionRecord.from_dict(int(key), data)
+        recent = snapshot.get(self.ns('recent'), {})
+        for key in sorted(recent, key=int):
+            self.recent_games[int(key)] = recent[key]
+
+        progress = snapshot.get(self.ns('meta'), {}).get('progress')
+        if progress:
+            self.current_game_number = progress['current_game_number']
+            self.last_processed_game_data = progress['last_processed_game_data']
+
+    def reset(self):
+        """Efface tout l'état de la table (mémoire et persistance)."""
+        self.pending_predictions.clear()
+        self.queued_predictions.clear()
+        self.recent_games.clear()
+        self.recent_outcomes.clear()
+        self.rolling.clear()
+        self.current_game_number = 0
+        self.last_processed_game_data = None
+        for kind in ('pending', 'queued', 'recent', 'meta'):
+            self.store.clear(self.ns(kind))
+        self._emit('reset')
+
+
+def build_tables(table_configs, outbound, store):
+    """Crée les tables à partir de la configuration (voir config.load_tables)."""
+    tables = []
+    for cfg in table_configs:
+        strategy_cls = STRATEGIES[cfg.get('strategy', PairRuleStrategy.name)]
+        strategy = strategy_cls(mapping=cfg.get('mapping'), target_offset=cfg.get('target_offset', 9))
+        tables.append(PredictionTable(
+            cfg['name'], cfg['source'], cfg['prediction'], strategy, outbound, store,
+            max_pending=cfg.get('max_pending', 2),
+            proximity_threshold=cfg.get('proximity_threshold', 3),
+            backup_offset=cfg.get('backup_offset', 9),
+            game_window=cfg.get('game_window', GAME_WINDOW),
+        ))
+    return tables
+
+
+def index_by_source(tables):
+    """Index canal source -> tables, pour le routage O(1) des messages."""
+    index = {}
+    for table in tables:
+        index.setdefault(table.source_channel_id, []).append(table)
+    return {source: tuple(group) for source, group in index.items()}
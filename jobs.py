@@ -0,0 +1,188 @@
+"""
+Exécution des calculs lourds dans un pool de processus.
+
+Les statistiques, backtests et exports ne tournent jamais sur la boucle
+asyncio qui traite les mises à jour Telegram : ils sont soumis à un
+ProcessPoolExecutor (créé au premier job) et la boucle ne fait qu'attendre
+leur résultat. Les fonctions exécutées doivent être définies au niveau d'un
+module pour pouvoir être envoyées aux processus de travail.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+JOB_DURATION = REGISTRY.histogram('bot_job_seconds', "Durée des jobs du pool de processus",
+                                  buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0))
+JOB_FAILURES = REGISTRY.counter('bot_job_failures_total', "Jobs du pool de processus en échec")
+
+
+class JobRunner:
+    """Pool de processus partagé, avec suivi des jobs en cours."""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._executor = None
+        self._ids = itertools.count(1)
+        # job_id -> (nom, début)
+        self.running = {}
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0}
+        REGISTRY.gauge('bot_jobs_running', "Jobs en cours dans le pool de processus", lambda: len(self.running))
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 'spawn' : pas de fork d'un processus qui a déjà des threads (écriture SQLite) et une boucle.
+            # Chaque processus réimporte main.py, qui ne crée rien à l'import (le bot est dans bot.py)
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def run(self, name: str, fn, *args):
+        """Exécute `fn(*args)` dans un processus de travail et retourne son résultat."""
+        job_id = next(self._ids)
+        started = time.perf_counter()
+        self.running[job_id] = (name, started)
+        self.stats['submitted'] += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        except Exception:
+            self.stats['failed'] += 1
+            JOB_FAILURES.inc()
+            raise
+        finally:
+            del self.running[job_id]
+        self.stats['completed'] += 1
+        JOB_DURATION.observe(time.perf_counter() - started)
+        return result
+
+    def describe(self) -> list:
+        """Jobs en cours : (id, nom, secondes écoulées)."""
+        now = time.perf_counter()
+        return [(job_id, name, now - started) for job_id, (name, started) in self.running.items()]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# --- Jobs (exécutés dans les processus de travail) ---
+
+def history_job(db_path: str, table_name: str, offsets_spec: str, backup_spec: str,
+                log_path: str = '', source: int = None):
+    """
+    Charge et encode l'historique des jeux d'une table pour les backtests :
+    table `games` de la base d'état, ou journal de messages `log_path` s'il est
+    donné. Les tableaux sont renvoyés en octets : le processus principal n'a
+    pas à importer NumPy.
+    """
+    import backtest
+
+    offsets = backtest.parse_range(offsets_spec)
+    backup_offsets = backtest.parse_range(backup_spec)
+    padding = max(offsets) + max(backup_offsets) + 2
+    if log_path:
+        games = backtest.load_history(log_path, source)
+    else:
+        games = backtest.load_history_db(db_path, table_name)
+    _, masks, present = backtest.encode_history(games, padding)
+    return len(games), offsets, backup_offsets, padding, masks.tobytes(), present.tobytes()
+
+
+def backtest_job(masks: bytes, present: bytes, padding: int, offset: int, backup_offsets: list,
+                 mapping_kind: str, top: int):
+    """Backtest d'un décalage de cible sur toutes les variantes demandées : (offset, meilleures variantes, tableau)."""
+    import numpy as np
+    import backtest
+
+    masks = np.frombuffer(masks, dtype=np.uint8)
+    present = np.frombuffer(present, dtype=bool)
+    results = backtest.run_grid(masks, present, backtest.mapping_variants(mapping_kind), [offset],
+                                backup_offsets, padding)
+    results.sort(key=lambda r: r['hit_rate'], reverse=True)
+    return offset, results[:top], backtest.format_results(results, top)
+
+
+# Lignes par feuille Excel (limite du format, en-tête compris)
+XLSX_MAX_ROWS = 1048576
+
+_SHEET_TITLES = {'games': 'Jeux', 'predictions': 'Prédictions'}
+
+
+def _history_rows(conn, history: str, columns: tuple, table_name: str = None):
+    """Lignes d'une table d'historique dans l'ordre d'ajout, masques de couleurs convertis en symboles."""
+    from config import SUIT_BITS
+
+    query = f"SELECT {', '.join(columns)} FROM {history}"
+    params = ()
+    if table_name:
+        query += " WHERE table_name = ?"
+        params = (table_name,)
+    query += " ORDER BY rowid"
+    suit_index = columns.index('suits' if 'suits' in columns else 'suit')
+    # Curseur parcouru ligne à ligne : l'historique n'est jamais chargé en entier
+    for row in conn.execute(query, params):
+        row = list(row)
+        row[suit_index] = ''.join(suit for suit, bit in SUIT_BITS.items() if row[suit_index] & bit)
+        yield row
+
+
+def export_job(db_path: str, fmt: str, out_dir: str, table_name: str = None):
+    """
+    Exporte l'historique (jeux et prédictions) de la base SQLite en XLSX (une
+    feuille par table, mode write-only d'openpyxl) ou en CSV (un fichier par
+    table). Mémoire constante quel que soit le nombre de lignes. Retourne la
+    liste (chemin, nombre de lignes).
+    """
+    import csv
+    import os
+    import sqlite3
+    from datetime import datetime
+    from state_store import HISTORY_COLUMNS
+
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    files = []
+    try:
+        if fmt == 'csv':
+            for history, columns in HISTORY_COLUMNS.items():
+                path = os.path.join(out_dir, f"{history}_{stamp}.csv")
+                count = 0
+                with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                    for row in _history_rows(conn, history, columns, table_name):
+                        writer.writerow(row)
+                        count += 1
+                files.append((path, count))
+            return files
+
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        total = 0
+        for history, columns in HISTORY_COLUMNS.items():
+            part = 1
+            sheet = workbook.create_sheet(_SHEET_TITLES[history])
+            sheet.append(columns)
+            sheet_rows = 1
+            for row in _history_rows(conn, history, columns, table_name):
+                if sheet_rows >= XLSX_MAX_ROWS:
+                    part += 1
+                    sheet = workbook.create_sheet(f"{_SHEET_TITLES[history]} {part}")
+                    sheet.append(columns)
+                    sheet_rows = 1
+                sheet.append(row)
+                sheet_rows += 1
+                total += 1
+        path = os.path.join(out_dir, f"historique_{stamp}.xlsx")
+        workbook.save(path)
+        files.append((path, total))
+        return files
+    finally:
+        conn.close()
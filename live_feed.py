@@ -0,0 +1,79 @@
+"""
+Diffusion en direct de l'état du bot (API JSON et flux SSE).
+
+Les tables publient leurs événements (jeu finalisé, changement de statut
+d'une prédiction) dans un LiveFeed. Chaque événement incrémente la version
+de l'état : les réponses JSON sont mises en cache par version et ne sont
+reconstruites qu'à la première requête qui suit un changement. Les
+abonnés SSE reçoivent chaque événement, sérialisé une seule fois pour tous.
+"""
+import asyncio
+import json
+import time
+
+from metrics import REGISTRY
+
+
+class LiveFeed:
+    """Version de l'état, cache des réponses et abonnés au flux d'événements."""
+
+    def __init__(self, max_backlog: int = 100):
+        self.version = 0
+        # La version repart de 0 à chaque démarrage : l'époque du processus distingue les ETag
+        self.epoch = format(time.time_ns() // 1000, 'x')
+        self.max_backlog = max_backlog
+        self._subscribers = set()
+        # clé -> (version, corps de réponse)
+        self._cache = {}
+        self.stats = {'events': 0, 'rebuilds': 0, 'cache_hits': 0, 'dropped_clients': 0}
+        REGISTRY.gauge('bot_sse_clients', "Clients connectés au flux /api/events", lambda: len(self._subscribers))
+
+    # --- Événements (appelé depuis les tables, jamais bloquant) ---
+
+    def publish(self, event_type: str, data: dict):
+        self.version += 1
+        self.stats['events'] += 1
+        if not self._subscribers:
+            return
+        message = f"id: {self.version}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Client trop lent : déconnecté plutôt que de laisser la file grossir
+                self._subscribers.discard(queue)
+                self.stats['dropped_clients'] += 1
+
+    def invalidate(self):
+        """À appeler quand l'état change sans événement (reset, restauration)."""
+        self.version += 1
+
+    # --- Cache des réponses ---
+
+    def etag(self) -> str:
+        """ETag de l'état courant, jamais réutilisé après un redémarrage."""
+        return f'"{self.epoch}-{self.version}"'
+
+    def cached(self, key: str, build):
+        """Résultat de `build()` pour la version courante, reconstruit seulement si l'état a changé."""
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == self.version:
+            self.stats['cache_hits'] += 1
+            return entry[1]
+        body = build()
+        self._cache[key] = (self.version, body)
+        self.stats['rebuilds'] += 1
+        return body
+
+    # --- Abonnés SSE ---
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(self.max_backlog)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def is_subscribed(self, queue: asyncio.Queue) -> bool:
+        return queue in self._subscribers
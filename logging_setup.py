@@ -0,0 +1,175 @@
+"""
+Journalisation hors de la boucle asyncio.
+
+Un appel logger.* ne fait que déposer l'enregistrement dans une file bornée
+(QueueHandler) ; le formatage (JSON d'une ligne ou texte) et l'écriture sur
+stdout sont faits par un thread (QueueListener). Les messages utilisent le
+formatage différé (`logger.info("Jeu #%s", n)`) : rien n'est formaté pour un
+niveau désactivé ou une ligne limitée, et le modèle du message sert de clé à
+la limitation des lignes répétitives (« Stock actif plein »...). Une sortie
+bloquée ne bloque jamais la boucle : file pleine, la ligne est abandonnée et
+comptée.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from metrics import REGISTRY
+
+LOG_DROPPED = {
+    reason: REGISTRY.counter('bot_log_dropped_total', "Lignes de journal abandonnées", reason=reason)
+    for reason in ('rate_limit', 'queue_full')
+}
+
+# Arguments laissés tels quels jusqu'au thread d'écriture ; les autres sont convertis en texte à l'appel
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None))
+
+_queue = None
+_listener = None
+
+REGISTRY.gauge('bot_log_queue', "Lignes de journal en attente d'écriture",
+               lambda: _queue.qsize() if _queue is not None else 0)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Au plus `limit` lignes par modèle de message et par fenêtre de `window`
+    secondes. Les erreurs ne sont jamais limitées ; le nombre de lignes
+    supprimées est joint à la première ligne de la fenêtre suivante.
+    """
+
+    def __init__(self, limit: int, window: float, clock=time.monotonic):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.clock = clock
+        # (logger, modèle) -> [début de la fenêtre, lignes émises, lignes supprimées]
+        self._windows = {}
+
+    def filter(self, record) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else str(record.msg))
+        now = self.clock()
+        state = self._windows.get(key)
+        if state is None or now - state[0] >= self.window:
+            if state is not None and state[2]:
+                record.suppressed = state[2]
+            elif state is None and len(self._windows) >= 1024:
+                self._prune(now)
+            self._windows[key] = [now, 1, 0]
+            return True
+        if state[1] < self.limit:
+            state[1] += 1
+            return True
+        state[2] += 1
+        LOG_DROPPED['rate_limit'].inc()
+        return False
+
+    def _prune(self, now: float):
+        # Modèles variables (messages déjà formatés par des bibliothèques) : fenêtres terminées oubliées
+        for key in [k for k, state in self._windows.items() if now - state[0] >= self.window]:
+            del self._windows[key]
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED['queue_full'].inc()
+
+    def prepare(self, record):
+        # Formatage laissé au thread d'écriture, sauf ce qui peut changer d'ici là
+        if isinstance(record.args, dict):
+            record.msg, record.args = record.getMessage(), None
+        elif record.args and not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in record.args):
+            record.args = tuple(arg if isinstance(arg, _IMMUTABLE_ARGS) else str(arg) for arg in record.args)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement : ts, level, logger, table, msg, suppressed, exc."""
+
+    def format(self, record) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        table = getattr(record, 'table', None)
+        if table:
+            entry['table'] = table
+        entry['msg'] = record.getMessage()
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Format texte historique, préfixé par la table."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(message)s')
+
+    def formatMessage(self, record) -> str:
+        message = record.message
+        table = getattr(record, 'table', None)
+        if table:
+            record.message = f"[{table}] {record.message}"
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            record.message += f" (+{suppressed} lignes similaires supprimées)"
+        try:
+            return super().formatMessage(record)
+        finally:
+            record.message = message
+
+
+def setup_logging(fmt: str = 'json', level: str = 'INFO', rate_limit: int = 20, rate_window: float = 10.0,
+                  queue_size: int = 10000, stream=None):
+    """Remplace les handlers du logger racine par la file vers le thread d'écriture."""
+    global _queue, _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    _queue = queue.Queue(queue_size)
+    handler = _NonBlockingQueueHandler(_queue)
+    handler.addFilter(RateLimitFilter(rate_limit, rate_window))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(_queue, output)
+    _listener.start()
+
+
+def stop_logging():
+    """Écrit les lignes encore en file puis arrête le thread d'écriture."""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            # Sortie bloquée : le thread (daemon) est abandonné avec les lignes restantes
+            pass
+        _listener = None
+
+
+atexit.register(stop_logging)
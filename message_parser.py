@@ -0,0 +1,64 @@
+"""
+Analyse en une passe des messages du canal source.
+
+Le texte est parcouru une seule fois avec une expression précompilée :
+numéro de jeu (#N), groupes de cartes entre parenthèses réduits chacun à un
+masque de couleurs (voir SUIT_BITS dans config.py) et état de finalisation.
+"""
+import re
+from typing import NamedTuple, Optional, Tuple
+
+from config import SUIT_BITS
+
+# Numéro de jeu (#N123) ou groupe entre parenthèses, dans l'ordre du texte
+_TOKEN_RE = re.compile(r"#N\s*(\d+)|\(([^)]*)\)", re.IGNORECASE)
+
+# Caractères de base des couleurs ; les sélecteurs de variante (U+FE0F) sont ignorés
+# d'office et '❤' est une variante de '♥'
+_SUIT_CHARS = tuple(SUIT_BITS.items()) + (('❤', SUIT_BITS['♥']),)
+
+
+class ParsedMessage(NamedTuple):
+    """Résultat compact de l'analyse d'un message."""
+    game_number: Optional[int]
+    groups: Tuple[str, ...]
+    masks: Tuple[int, ...]
+    finalized: bool
+
+
+_NOT_FINALIZED = ParsedMessage(None, (), (), False)
+
+
+def is_message_finalized(message: str) -> bool:
+    """Vérifie si le message est un résultat final (non en cours)."""
+    if '⏰' in message:
+        return False
+    return '✅' in message or '🔰' in message
+
+
+def suit_mask(group_str: str) -> int:
+    """Masque des couleurs présentes dans un groupe."""
+    mask = 0
+    for char, bit in _SUIT_CHARS:
+        if char in group_str:
+            mask |= bit
+    return mask
+
+
+def parse_message(message: str) -> ParsedMessage:
+    """
+    Analyse un message en une passe. Les messages non finalisés (⏰) sont
+    rejetés avant toute expression régulière.
+    """
+    if not is_message_finalized(message):
+        return _NOT_FINALIZED
+
+    game_number = None
+    groups = []
+    for game, group in _TOKEN_RE.findall(message):
+        if group or not game:
+            groups.append(group)
+        elif game_number is None:
+            game_number = int(game)
+
+    return ParsedMessage(game_number, tuple(groups), tuple(suit_mask(g) for g in groups), True)
@@ -0,0 +1,178 @@
+"""
+Métriques au format texte Prometheus, sans dépendance externe.
+
+L'instrumentation sur le chemin critique se limite à des additions d'entiers
+(compteurs) et à un bisect sur des seuils fixes (histogrammes) : pas de
+verrou (tout tourne sur la boucle asyncio) et aucun formatage de chaîne
+avant le rendu de /metrics. Les valeurs déjà comptées ailleurs (compteurs du
+pré-filtre, tailles des files) sont lues par des fonctions au moment du rendu.
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+
+from profiler import PROFILER
+
+# Seuils par défaut (secondes), de 10 µs à 10 s
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0
+)
+
+
+def _format_labels(labels: dict, extra: str = '') -> str:
+    parts = [f'{k}="{v}"' for k, v in labels.items()]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    __slots__ = ('labels', 'value')
+
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name):
+        yield f"{name}{_format_labels(self.labels)} {self.value}"
+
+
+class Gauge:
+    __slots__ = ('labels', 'value', 'fn')
+
+    def __init__(self, labels, fn=None):
+        self.labels = labels
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name):
+        value = self.fn() if self.fn is not None else self.value
+        yield f"{name}{_format_labels(self.labels)} {value}"
+
+
+class CallbackCounter(Gauge):
+    """Compteur dont la valeur est lue au rendu (ex. un dict de statistiques existant)."""
+    __slots__ = ()
+
+
+class Histogram:
+    __slots__ = ('labels', 'buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, labels, buckets):
+        self.labels = labels
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            labels = _format_labels(self.labels, 'le="%s"' % bound)
+            yield f"{name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labels, 'le="+Inf"')
+        yield f"{name}_bucket{labels} {self.count}"
+        labels = _format_labels(self.labels)
+        yield f"{name}_sum{labels} {self.sum}"
+        yield f"{name}_count{labels} {self.count}"
+
+
+class Registry:
+    """Ensemble de familles de métriques (nom, type, aide) et de leurs séries."""
+
+    def __init__(self):
+        self._families = {}
+
+    def _series(self, name, kind, help_text, key, factory):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help_text, {})
+        series = family[2]
+        if key not in series:
+            series[key] = factory()
+        return series[key]
+
+    def counter(self, name, help_text, **labels) -> Counter:
+        return self._series(name, 'counter', help_text, tuple(labels.items()), lambda: Counter(labels))
+
+    def counter_fn(self, name, help_text, fn, **labels) -> CallbackCounter:
+        return self._series(name, 'counter', help_text, tuple(labels.items()), lambda: CallbackCounter(labels, fn))
+
+    def gauge(self, name, help_text, fn=None, **labels) -> Gauge:
+        return self._series(name, 'gauge', help_text, tuple(labels.items()), lambda: Gauge(labels, fn))
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+        return self._series(name, 'histogram', help_text, tuple(labels.items()),
+                            lambda: Histogram(labels, tuple(buckets)))
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text, series) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for metric in series.values():
+                lines.extend(metric.samples(name))
+        lines.append('')
+        return '\n'.join(lines)
+
+
+REGISTRY = Registry()
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = REGISTRY.histogram('bot_event_loop_lag_seconds', "Retard de réveil de la boucle asyncio")
+LOOP_LAG_LAST = REGISTRY.gauge('bot_event_loop_lag_last_seconds', "Dernier retard mesuré de la boucle asyncio")
+
+
+class BudgetGuard:
+    """
+    Signale les traitements qui occupent la boucle plus longtemps que `budget`
+    secondes : compteur par traitement, dernier dépassement conservé pour
+    /debug et un avertissement au plus toutes les `report_interval` secondes
+    par traitement.
+    """
+
+    def __init__(self, budget: float, report_interval: float = 60.0):
+        self.budget = budget
+        self.report_interval = report_interval
+        self.last_exceeded = {}
+        self._last_report = {}
+
+    def check(self, name: str, elapsed: float) -> bool:
+        if elapsed <= self.budget:
+            return False
+        REGISTRY.counter('bot_budget_exceeded_total', "Traitements au-delà du budget de la boucle", handler=name).inc()
+        now = time.monotonic()
+        self.last_exceeded[name] = (elapsed, time.time())
+        if now - self._last_report.get(name, float('-inf')) >= self.report_interval:
+            self._last_report[name] = now
+            logger.warning("🐢 %s: %.1f ms sur la boucle (budget %.0f ms)", name, elapsed * 1000, self.budget * 1000)
+        return True
+
+
+async def monitor_event_loop_lag(interval: float = 0.5, guard: BudgetGuard = None):
+    """Mesure en continu l'écart entre le réveil prévu et le réveil réel de la boucle."""
+    clock = time.perf_counter
+    while True:
+        expected = clock() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, clock() - expected)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+        if PROFILER.active:
+            PROFILER.record('event_loop:retard', lag)
+        if guard is not None:
+            guard.check('event_loop', lag)
@@ -0,0 +1,203 @@
+"""
+File d'envoi sortante vers Telegram.
+
+Le traitement des messages source ne fait plus qu'enfiler des opérations
+(envoi ou édition) sans attendre l'API : une tâche par chat les exécute dans
+l'ordre, espace les appels (limite de débit par chat), attend en cas de
+FloodWaitError et fusionne les éditions successives d'un même message pour
+n'envoyer que la dernière.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telethon.errors import FloodWaitError
+
+from dedup import BoundedDict
+from metrics import REGISTRY
+from profiler import PROFILER
+
+logger = logging.getLogger(__name__)
+
+API_LATENCY = {
+    kind: REGISTRY.histogram('bot_telegram_api_seconds', "Durée des appels Telegram sortants", op=kind)
+    for kind in ('send', 'edit')
+}
+QUEUE_LATENCY = REGISTRY.histogram('bot_outbound_queue_seconds', "Délai entre l'enfilage et la fin de l'appel Telegram")
+API_FAILURES = {
+    kind: REGISTRY.counter('bot_telegram_failures_total', "Appels Telegram sortants en échec", op=kind)
+    for kind in ('send', 'edit')
+}
+DROPPED_EDITS = REGISTRY.counter('bot_outbound_dropped_edits_total',
+                                 "Éditions abandonnées faute d'identifiant du message à éditer")
+
+
+class _Op:
+    __slots__ = ('kind', 'chat_id', 'key', 'text', 'message_id', 'on_sent', 'enqueued_at')
+
+    def __init__(self, kind, chat_id, key, text, message_id=None, on_sent=None):
+        self.kind = kind
+        self.chat_id = chat_id
+        self.key = key
+        self.text = text
+        self.message_id = message_id
+        self.on_sent = on_sent
+        self.enqueued_at = time.perf_counter()
+
+
+class OutboundDispatcher:
+    """Répartiteur d'envois Telegram non bloquant, avec une file et une tâche par chat."""
+
+    def __init__(self, client, min_interval: float = 1.0, max_flood_retries: int = 3):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_flood_retries = max_flood_retries
+        self._queues = {}
+        self._workers = {}
+        self._wakeups = {}
+        self._queued_edits = {}
+        self._last_call = {}
+        self._inflight = 0
+        # Identifiant Telegram des messages envoyés avec une clé (pour les éditions)
+        self.message_ids = BoundedDict(1000)
+        self.stats = {
+            'sent': 0,
+            'edited': 0,
+            'failed': 0,
+            'coalesced': 0,
+            'dropped_edits': 0,
+            'flood_waits': 0,
+            'max_depth': 0,
+            'api_calls': 0,
+            'api_latency_total': 0.0,
+            'api_latency_max': 0.0,
+            'queue_latency_total': 0.0,
+            'queue_latency_max': 0.0,
+        }
+
+    # --- Enfilage (chemin critique, jamais bloquant) ---
+
+    def send_message(self, chat_id: int, text: str, key=None, on_sent=None):
+        """Enfile un envoi ; `on_sent(message_id)` est appelé une fois le message publié."""
+        self._enqueue(_Op('send', chat_id, key, text, on_sent=on_sent))
+
+    def edit_message(self, chat_id: int, key, text: str, message_id: int = None):
+        """Enfile une édition ; une édition encore en file pour la même clé est remplacée."""
+        queued = self._queued_edits.get(key)
+        if queued is not None:
+            queued.text = text
+            if message_id:
+                queued.message_id = message_id
+            self.stats['coalesced'] += 1
+            return
+        op = _Op('edit', chat_id, key, text, message_id=message_id)
+        self._queued_edits[key] = op
+        self._enqueue(op)
+
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _enqueue(self, op: _Op):
+        queue = self._queues.get(op.chat_id)
+        if queue is None:
+            queue = self._queues[op.chat_id] = deque()
+            self._wakeups[op.chat_id] = asyncio.Event()
+        queue.append(op)
+
+        depth = self.queue_depth()
+        if depth > self.stats['max_depth']:
+            self.stats['max_depth'] = depth
+
+        worker = self._workers.get(op.chat_id)
+        if worker is None or worker.done():
+            self._workers[op.chat_id] = asyncio.get_running_loop().create_task(self._worker(op.chat_id))
+        self._wakeups[op.chat_id].set()
+
+    # --- Exécution ---
+
+    async def _worker(self, chat_id: int):
+        queue = self._queues[chat_id]
+        wakeup = self._wakeups[chat_id]
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+
+            op = queue.popleft()
+            if op.kind == 'edit' and self._queued_edits.get(op.key) is op:
+                del self._queued_edits[op.key]
+
+            self._inflight += 1
+            try:
+                await self._throttle(chat_id)
+                await self._execute(op)
+            except Exception as e:
+                self.stats['failed'] += 1
+                API_FAILURES[op.kind].inc()
+                logger.error("❌ Erreur envoi Telegram (%s) vers %s: %s", op.kind, chat_id, e)
+            finally:
+                self._inflight -= 1
+
+    async def _throttle(self, chat_id: int):
+        last = self._last_call.get(chat_id)
+        if last is not None and self.min_interval > 0:
+            wait = self.min_interval - (time.perf_counter() - last)
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+    async def _execute(self, op: _Op):
+        for attempt in range(self.max_flood_retries + 1):
+            started = time.perf_counter()
+            try:
+                if op.kind == 'send':
+                    msg = await self.client.send_message(op.chat_id, op.text)
+                    self._record(op, started)
+                    self.stats['sent'] += 1
+                    if op.key is not None:
+                        self.message_ids[op.key] = msg.id
+                    if op.on_sent is not None:
+                        op.on_sent(msg.id)
+                else:
+                    message_id = op.message_id or self.message_ids.get(op.key)
+                    if not message_id:
+                        self.stats['dropped_edits'] += 1
+                        DROPPED_EDITS.inc()
+                        logger.warning("⚠️ Édition ignorée: message inconnu pour %s", op.key)
+                        return
+                    await self.client.edit_message(op.chat_id, message_id, op.text)
+                    self._record(op, started)
+                    self.stats['edited'] += 1
+                return
+            except FloodWaitError as e:
+                self._last_call[op.chat_id] = time.perf_counter()
+                self.stats['flood_waits'] += 1
+                if attempt >= self.max_flood_retries:
+                    raise
+                logger.warning("⏳ FloodWait de %ss sur %s, nouvel essai", e.seconds, op.chat_id)
+                await asyncio.sleep(e.seconds)
+
+    def _record(self, op: _Op, started: float):
+        now = time.perf_counter()
+        self._last_call[op.chat_id] = now
+        api_latency = now - started
+        queue_latency = now - op.enqueued_at
+        API_LATENCY[op.kind].observe(api_latency)
+        QUEUE_LATENCY.observe(queue_latency)
+        if PROFILER.active:
+            PROFILER.record(f"telegram:{op.kind}", api_latency)
+            PROFILER.record('telegram:file+appel', queue_latency)
+        stats = self.stats
+        stats['api_calls'] += 1
+        stats['api_latency_total'] += api_latency
+        stats['queue_latency_total'] += queue_latency
+        if api_latency > stats['api_latency_max']:
+            stats['api_latency_max'] = api_latency
+        if queue_latency > stats['queue_latency_max']:
+            stats['queue_latency_max'] = queue_latency
+
+    async def drain(self):
+        """Attend que toutes les files soient vides et qu'aucun appel ne soit en cours."""
+        while self.queue_depth() or self._inflight:
+            await asyncio.sleep(0.01 if self.min_interval else 0)
@@ -0,0 +1,88 @@
+"""
+Profilage à la demande de la boucle asyncio (/profile).
+
+Pendant une fenêtre bornée, cProfile est activé sur le thread de la boucle
+(handlers Telethon, traitement des jeux, file sortante, bibliothèques) et
+les points déjà chronométrés (handlers, analyse, application des jeux,
+appels Telegram, retard de la boucle) enregistrent leur temps mur par
+section. Hors capture, le coût se limite au test de `PROFILER.active`.
+"""
+import cProfile
+import io
+import os
+import pstats
+import time
+from datetime import datetime
+
+# Durée maximale d'une capture (secondes)
+MAX_DURATION = 300
+
+
+class LoopProfiler:
+    """Capture cProfile et temps mur par section, une seule à la fois."""
+
+    def __init__(self):
+        self.active = False
+        self._profile = None
+        self._started = 0.0
+        # nom -> [appels, temps total, temps max]
+        self.sections = {}
+
+    def start(self):
+        if self.active:
+            raise RuntimeError("Profilage déjà en cours")
+        self.sections = {}
+        self._profile = cProfile.Profile()
+        self._started = time.perf_counter()
+        self.active = True
+        self._profile.enable()
+
+    def record(self, name: str, elapsed: float):
+        """Temps mur d'une section (n'appeler que si `active`)."""
+        section = self.sections.get(name)
+        if section is None:
+            self.sections[name] = [1, elapsed, elapsed]
+            return
+        section[0] += 1
+        section[1] += elapsed
+        if elapsed > section[2]:
+            section[2] = elapsed
+
+    def stop(self):
+        """Arrête la capture : (durée, profil cProfile, sections)."""
+        self._profile.disable()
+        self.active = False
+        profile, self._profile = self._profile, None
+        return time.perf_counter() - self._started, profile, self.sections
+
+
+PROFILER = LoopProfiler()
+
+
+def write_report(duration: float, profile: cProfile.Profile, sections: dict, out_dir: str, top: int = 40) -> list:
+    """Écrit le rapport texte et le profil brut (pstats, pour snakeviz) ; retourne leurs chemins."""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    out = io.StringIO()
+    out.write(f"Profil de la boucle asyncio - {duration:.1f}s ({stamp})\n\n")
+
+    out.write("Temps mur par section (coroutines et appels Telegram)\n")
+    out.write(f"{'section':<32} {'appels':>8} {'total s':>10} {'moy ms':>10} {'max ms':>10} {'% fenêtre':>10}\n")
+    for name, (count, total, worst) in sorted(sections.items(), key=lambda item: item[1][1], reverse=True):
+        out.write(f"{name:<32} {count:>8} {total:>10.3f} {total / count * 1000:>10.2f} {worst * 1000:>10.2f} "
+                  f"{total / duration:>10.1%}\n")
+    if not sections:
+        out.write("(aucune activité)\n")
+
+    stats = pstats.Stats(profile, stream=out)
+    stats.strip_dirs()
+    out.write(f"\n\nFonctions les plus coûteuses (temps propre, top {top})\n")
+    stats.sort_stats('tottime').print_stats(top)
+    out.write(f"\nFonctions les plus coûteuses (temps cumulé, top {top})\n")
+    stats.sort_stats('cumulative').print_stats(top)
+
+    report_path = os.path.join(out_dir, f"profil_{stamp}.txt")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(out.getvalue())
+    raw_path = os.path.join(out_dir, f"profil_{stamp}.pstats")
+    profile.dump_stats(raw_path)
+    return [report_path, raw_path]
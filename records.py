@@ -0,0 +1,152 @@
+"""
+Enregistrements compacts des prédictions.
+
+Une prédiction active ou en file est un `PredictionRecord` à `__slots__` :
+couleurs en bits (voir config.SUIT_BITS) et horodatage en nanosecondes
+monotones, converti en date ISO uniquement à la persistance, à l'export et
+dans l'API. Les prédictions terminées vont dans un `OutcomeRing`, tampon
+circulaire de tableaux `array` (14 octets par résultat au lieu de plusieurs
+centaines pour un dict) : une journée entière tient en quelques dizaines de Ko.
+"""
+import time
+from array import array
+from datetime import datetime
+
+from config import SUIT_SYMBOLS
+from rolling_stats import OUTCOMES
+
+# Décalage horloge murale - horloge monotone, fixé au démarrage du processus
+_WALL_OFFSET_NS = time.time_ns() - time.monotonic_ns()
+
+# Code d'un résultat dans l'OutcomeRing : sa position dans OUTCOMES
+_OUTCOME_CODES = {status: code for code, status in enumerate(OUTCOMES)}
+
+
+def now_ns() -> int:
+    return time.monotonic_ns()
+
+
+def to_isoformat(mono_ns: int) -> str:
+    """Date ISO (heure locale) d'un horodatage monotone du processus courant."""
+    return datetime.fromtimestamp((mono_ns + _WALL_OFFSET_NS) / 1e9).isoformat()
+
+
+def from_isoformat(value) -> int:
+    """Horodatage monotone correspondant à une date ISO persistée (0 si absente ou invalide)."""
+    try:
+        return int(datetime.fromisoformat(value).timestamp() * 1e9) - _WALL_OFFSET_NS
+    except (TypeError, ValueError):
+        return 0
+
+
+class PredictionRecord:
+    """
+    Prédiction en file ('en file') ou active (statut affiché dans le canal).
+    `display_game` est le numéro publié dans le canal : il ne change pas quand
+    `target_game` est renuméroté au retour du compteur de jeux.
+    """
+
+    __slots__ = ('target_game', 'suit', 'base_game', 'alternate_suit', 'backup_game',
+                 'status', 'check_count', 'message_id', 'created_ns', 'display_game')
+
+    def __init__(self, target_game: int, suit: int, base_game: int, alternate_suit: int = 0,
+                 backup_game: int = 0, status: str = 'en file', check_count: int = 0,
+                 message_id: int = 0, created_ns: int = None, display_game: int = None):
+        self.target_game = target_game
+        self.display_game = target_game if display_game is None else display_game
+        self.suit = suit
+        self.base_game = base_game
+        self.alternate_suit = alternate_suit
+        self.backup_game = backup_game
+        self.status = status
+        self.check_count = check_count
+        self.message_id = message_id
+        self.created_ns = now_ns() if created_ns is None else created_ns
+
+    @property
+    def created_at(self) -> str:
+        return to_isoformat(self.created_ns)
+
+    def to_dict(self) -> dict:
+        """Forme persistée (StateStore) et servie par l'API."""
+        return {
+            'target_game': self.target_game,
+            'suit': self.suit,
+            'base_game': self.base_game,
+            'alternate_suit': self.alternate_suit,
+            'backup_game': self.backup_game,
+            'status': self.status,
+            'check_count': self.check_count,
+            'message_id': self.message_id,
+            'created_at': self.created_at,
+            'display_game': self.display_game,
+        }
+
+    @classmethod
+    def from_dict(cls, target_game: int, data: dict, status: str = 'en file'):
+        """Relit un enregistrement persisté, y compris l'ancien format (dicts 'predicted_suit'/'queued_at')."""
+        return cls(
+            target_game,
+            data['suit'] if 'suit' in data else data['predicted_suit'],
+            data.get('base_game', 0),
+            alternate_suit=data.get('alternate_suit', 0),
+            backup_game=data.get('backup_game', 0),
+            status=data.get('status', status),
+            check_count=data.get('check_count', 0),
+            message_id=data.get('message_id') or 0,
+            created_ns=from_isoformat(data.get('created_at') or data.get('queued_at')),
+            display_game=data.get('display_game'),
+        )
+
+    def __repr__(self):
+        return (f"PredictionRecord(#{self.target_game} {SUIT_SYMBOLS.get(self.suit, '?')} "
+                f"{self.status} base #{self.base_game})")
+
+
+class OutcomeRing:
+    """Derniers résultats de prédiction (jeu, couleur, statut, heure) dans des tableaux de taille fixe."""
+
+    __slots__ = ('capacity', '_games', '_suits', '_statuses', '_resolved', '_next', '_size')
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity doit être >= 1")
+        self.capacity = capacity
+        self._games = array('i', bytes(array('i').itemsize * capacity))
+        self._suits = array('B', bytes(capacity))
+        self._statuses = array('B', bytes(capacity))
+        self._resolved = array('q', bytes(array('q').itemsize * capacity))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, game_number: int, suit: int, status: str, resolved_ns: int = None):
+        i = self._next
+        self._games[i] = game_number
+        self._suits[i] = suit
+        self._statuses[i] = _OUTCOME_CODES[status]
+        self._resolved[i] = now_ns() if resolved_ns is None else resolved_ns
+        self._next = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def clear(self):
+        self._next = 0
+        self._size = 0
+
+    def latest(self, limit: int = None) -> list:
+        """Les `limit` derniers résultats (tous par défaut), du plus ancien au plus récent, en dicts JSON."""
+        count = self._size if limit is None else min(limit, self._size)
+        start = (self._next - count) % self.capacity
+        result = []
+        for k in range(count):
+            i = (start + k) % self.capacity
+            result.append({
+                'game': self._games[i],
+                'suit': SUIT_SYMBOLS[self._suits[i]],
+                'status': OUTCOMES[self._statuses[i]],
+                'resolved_at': to_isoformat(self._resolved[i]),
+            })
+        return result
@@ -0,0 +1,177 @@
+"""
+Rejeu hors ligne d'un journal de messages du canal source.
+
+Le journal (JSONL ou CSV) contient un message par ligne avec au minimum le
+texte (`text` ou `message`) et, optionnellement, `id`/`message_id`, `chat_id`
+et `edited`. Chaque message est injecté dans `process_finalized_message` avec
+un client Telegram local à la place de Telethon, à pleine vitesse CPU.
+
+Utilisation : python main.py --replay messages.jsonl [--verbose]
+"""
+import asyncio
+import csv
+import json
+import logging
+import time
+from types import SimpleNamespace
+
+from engine import FINAL_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Prédiction active expirée sans résultat (fenêtre de jeux ou nouveau cycle après des jeux manqués)
+EXPIRED_STATUS = '⌛'
+
+
+def load_message_log(path: str):
+    """Charge un journal JSONL ou CSV et retourne la liste des messages normalisés."""
+    messages = []
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+
+        for index, row in enumerate(rows, 1):
+            text = row.get('text') or row.get('message') or ''
+            edited = row.get('edited', False)
+            if isinstance(edited, str):
+                edited = edited.strip().lower() in ('1', 'true', 'yes', 'oui')
+            messages.append({
+                'id': int(row.get('id') or row.get('message_id') or index),
+                'chat_id': int(row['chat_id']) if row.get('chat_id') else None,
+                'text': text,
+                'edited': bool(edited),
+            })
+    return messages
+
+
+class ReplayClient:
+    """Remplaçant local de TelegramClient : enregistre les envois et éditions sans réseau."""
+
+    def __init__(self):
+        self.next_id = 1
+        self.sent = []
+        self.edits = []
+
+    async def send_message(self, entity, message, **kwargs):
+        msg = SimpleNamespace(id=self.next_id, chat_id=entity, message=message)
+        self.next_id += 1
+        self.sent.append(msg)
+        return msg
+
+    async def edit_message(self, entity, message, text=None, **kwargs):
+        self.edits.append((entity, message, text))
+        return SimpleNamespace(id=message, chat_id=entity, message=text)
+
+    def is_connected(self):
+        return False
+
+
+def percentile(sorted_values, pct: float):
+    """Percentile par rang le plus proche sur une liste déjà triée."""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def build_report(bot, stub: ReplayClient, latencies_ns, finalized_games: int, elapsed: float):
+    """Calcule débit, latences et résultats des prédictions à partir du client local."""
+    latencies_ns.sort()
+    prediction_channels = {table.prediction_channel_id for table in bot.tables}
+    prediction_ids = {(m.chat_id, m.id) for m in stub.sent if m.chat_id in prediction_channels}
+
+    # Dernier statut connu de chaque message de prédiction
+    final_status = {}
+    for entity, message_id, text in stub.edits:
+        if (entity, message_id) in prediction_ids and text:
+            for status in FINAL_STATUSES + (EXPIRED_STATUS,):
+                if text.endswith(status):
+                    final_status[(entity, message_id)] = status
+                    break
+
+    outcomes = {status: 0 for status in FINAL_STATUSES + (EXPIRED_STATUS,)}
+    for status in final_status.values():
+        outcomes[status] += 1
+    resolved = sum(outcomes[status] for status in FINAL_STATUSES)
+    hits = outcomes['✅0️⃣'] + outcomes['✅1️⃣']
+
+    return {
+        'messages': len(latencies_ns),
+        'finalized_games': finalized_games,
+        'elapsed_s': elapsed,
+        'messages_per_s': len(latencies_ns) / elapsed if elapsed else 0.0,
+        'games_per_s': finalized_games / elapsed if elapsed else 0.0,
+        'latency_us': {
+            'p50': percentile(latencies_ns, 50) / 1000,
+            'p90': percentile(latencies_ns, 90) / 1000,
+            'p99': percentile(latencies_ns, 99) / 1000,
+            'max': (latencies_ns[-1] if latencies_ns else 0) / 1000,
+        },
+        'predictions_sent': len(prediction_ids),
+        'admin_transfers': sum(1 for m in stub.sent if m.chat_id == bot.ADMIN_ID),
+        'outcomes': outcomes,
+        'unresolved': len(prediction_ids) - resolved - outcomes[EXPIRED_STATUS],
+        'hit_rate': hits / resolved if resolved else 0.0,
+    }
+
+
+def format_report(report) -> str:
+    lat = report['latency_us']
+    outcomes = report['outcomes']
+    return (
+        f"📼 Replay: {report['messages']} messages, {report['finalized_games']} jeux finalisés "
+        f"en {report['elapsed_s']:.3f}s\n"
+        f"⚡ Débit: {report['messages_per_s']:.0f} msg/s, {report['games_per_s']:.0f} jeux/s\n"
+        f"⏱️ Latence (µs): p50={lat['p50']:.1f} p90={lat['p90']:.1f} p99={lat['p99']:.1f} max={lat['max']:.1f}\n"
+        f"🔮 Prédictions envoyées: {report['predictions_sent']} "
+        f"(✅0️⃣ {outcomes['✅0️⃣']}, ✅1️⃣ {outcomes['✅1️⃣']}, ❌ {outcomes['❌']}, "
+        f"⌛ expirées {outcomes[EXPIRED_STATUS]}, en cours {report['unresolved']})\n"
+        f"🎯 Taux de réussite: {report['hit_rate']:.1%}\n"
+        f"📨 Transferts admin: {report['admin_transfers']}"
+    )
+
+
+async def run_replay(bot, path: str, verbose: bool = False):
+    """Rejoue le journal `path` à travers le pipeline du module `bot` (main) et affiche le rapport."""
+    messages = load_message_log(path)
+
+    stub = ReplayClient()
+    bot.client = stub
+    bot.outbound.client = stub
+    bot.outbound.min_interval = 0
+    bot.source_channel_ok = True
+    for table in bot.tables:
+        table.prediction_channel_ok = True
+
+    if not verbose:
+        logging.getLogger(bot.__name__).setLevel(logging.WARNING)
+        logging.getLogger('engine').setLevel(logging.WARNING)
+
+    # Messages sans chat_id : attribués au canal source de la première table
+    default_source = bot.tables[0].source_channel_id
+    source_messages = []
+    for m in messages:
+        m['chat_id'] = m['chat_id'] or default_source
+        if m['chat_id'] in bot.tables_by_source:
+            source_messages.append(m)
+    latencies_ns = []
+    clock = time.perf_counter_ns
+    # Messages finalisés acceptés (après déduplication), tous cycles du compteur compris
+    finalized_before = bot.FINALIZED_GAMES.value
+    started = time.perf_counter()
+
+    for msg in source_messages:
+        t0 = clock()
+        await bot.process_finalized_message(msg['text'], msg['chat_id'], msg['id'])
+        latencies_ns.append(clock() - t0)
+        # Laisse la file sortante se vider comme en production
+        await asyncio.sleep(0)
+
+    await bot.sequencer.flush()
+    elapsed = time.perf_counter() - started
+    await bot.outbound.drain()
+    report = build_report(bot, stub, latencies_ns, bot.FINALIZED_GAMES.value - finalized_before, elapsed)
+    logger.warning("\n%s", format_report(report))
+    return report
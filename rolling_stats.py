@@ -0,0 +1,118 @@
+"""
+Statistiques glissantes mises à jour à chaque jeu finalisé.
+
+Chaque jeu ajoute un enregistrement (couleurs du premier groupe, règle de
+paire déclenchée, résultats des prédictions terminées pendant ce jeu) à des
+fenêtres de N jeux et de 24 h. Chaque fenêtre tient les totaux à jour à
+l'ajout et au retrait de l'enregistrement le plus ancien : O(1) par jeu et
+lecture sans parcours pour /status et la page web.
+
+Les fenêtres sont en mémoire et repartent de zéro au redémarrage.
+"""
+import time
+from collections import deque
+
+from config import SUIT_BITS
+
+OUTCOMES = ('✅0️⃣', '✅1️⃣', '❌', 'supprimée')
+
+# Position des compteurs dans un enregistrement : jeux, couleurs, déclenchements, résultats
+_GAMES = 0
+_SUITS = 1
+_TRIGGERS = _SUITS + len(SUIT_BITS)
+_OUTCOMES = _TRIGGERS + 1
+_WIDTH = _OUTCOMES + len(OUTCOMES)
+
+# Masque de couleurs -> présence de chaque couleur (0/1), dans l'ordre de SUIT_BITS
+_MASK_SUITS = tuple(tuple(1 if mask & bit else 0 for bit in SUIT_BITS.values()) for mask in range(16))
+
+
+class SlidingWindow:
+    """Totaux des enregistrements des `size` derniers jeux et/ou des `duration` dernières secondes."""
+
+    __slots__ = ('name', 'size', 'duration', '_records', 'totals')
+
+    def __init__(self, name: str, size: int = None, duration: float = None):
+        self.name = name
+        self.size = size
+        self.duration = duration
+        self._records = deque()
+        self.totals = [0] * _WIDTH
+
+    def add(self, at: float, counts: tuple):
+        self._records.append((at, counts))
+        totals = self.totals
+        for i, value in enumerate(counts):
+            totals[i] += value
+        if self.size is not None and len(self._records) > self.size:
+            self._evict()
+        self.expire(at)
+
+    def clear(self):
+        self._records.clear()
+        self.totals = [0] * _WIDTH
+
+    def expire(self, now: float):
+        if self.duration is not None:
+            limit = now - self.duration
+            while self._records and self._records[0][0] < limit:
+                self._evict()
+
+    def _evict(self):
+        _, counts = self._records.popleft()
+        totals = self.totals
+        for i, value in enumerate(counts):
+            totals[i] -= value
+
+    def summary(self) -> dict:
+        t = self.totals
+        games = t[_GAMES]
+        outcomes = dict(zip(OUTCOMES, t[_OUTCOMES:]))
+        resolved = outcomes['✅0️⃣'] + outcomes['✅1️⃣'] + outcomes['❌']
+        return {
+            'games': games,
+            'suit_rates': {
+                suit: (t[_SUITS + i] / games if games else 0.0) for i, suit in enumerate(SUIT_BITS)
+            },
+            'trigger_rate': t[_TRIGGERS] / games if games else 0.0,
+            'outcomes': outcomes,
+            'hit_rate': (outcomes['✅0️⃣'] + outcomes['✅1️⃣']) / resolved if resolved else 0.0,
+            'first_hit_rate': outcomes['✅0️⃣'] / resolved if resolved else 0.0,
+        }
+
+
+class RollingStats:
+    """Fenêtres glissantes d'une table : 100 jeux, 1000 jeux et 24 h par défaut."""
+
+    def __init__(self, sizes=(100, 1000), duration: float = 86400.0, clock=time.monotonic):
+        self.clock = clock
+        self.windows = [SlidingWindow(f"{size} jeux", size=size) for size in sizes]
+        if duration:
+            self.windows.append(SlidingWindow('24 h' if duration == 86400 else f"{duration:.0f} s", duration=duration))
+        # Résultats enregistrés depuis le dernier jeu, rattachés au prochain
+        self._pending_outcomes = [0] * len(OUTCOMES)
+        self._outcome_index = {status: i for i, status in enumerate(OUTCOMES)}
+
+    def record_outcome(self, status: str):
+        self._pending_outcomes[self._outcome_index[status]] += 1
+
+    def record_game(self, suits_mask: int, triggered: bool):
+        counts = (1,) + _MASK_SUITS[suits_mask] + (1 if triggered else 0,) + tuple(self._pending_outcomes)
+        self._pending_outcomes = [0] * len(OUTCOMES)
+        now = self.clock()
+        for window in self.windows:
+            window.add(now, counts)
+
+    def clear(self):
+        for window in self.windows:
+            window.clear()
+        self._pending_outcomes = [0] * len(OUTCOMES)
+
+    def summaries(self) -> list:
+        """(nom de la fenêtre, résumé) pour chaque fenêtre, fenêtres de durée mises à jour."""
+        now = self.clock()
+        result = []
+        for window in self.windows:
+            window.expire(now)
+            result.append((window.name, window.summary()))
+        return result
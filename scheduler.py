@@ -0,0 +1,45 @@
+"""
+File de prédictions indexée par numéro de jeu cible.
+
+Un tas des numéros cibles donne la prédiction en file la plus proche en
+O(1) et l'extrait en O(log n). La file reste un dict (affichage, persistance,
+tests d'unicité) ; une entrée retirée du dict par ailleurs est simplement
+ignorée quand elle arrive en tête du tas.
+"""
+import heapq
+
+
+class TargetQueue(dict):
+    """Dict {jeu cible: données} dont la plus petite clé est accessible en O(log n)."""
+
+    def __init__(self):
+        super().__init__()
+        self._heap = []
+
+    def __setitem__(self, target_game: int, value):
+        if target_game not in self:
+            heapq.heappush(self._heap, target_game)
+        super().__setitem__(target_game, value)
+
+    def first(self):
+        """Plus petit jeu cible encore en file, ou None."""
+        heap = self._heap
+        while heap and heap[0] not in self:
+            heapq.heappop(heap)
+        if len(heap) > 2 * len(self) + 16:
+            # Beaucoup d'entrées retirées hors du tas : reconstruction
+            self._heap = heap = list(self)
+            heapq.heapify(heap)
+        return heap[0] if heap else None
+
+    def pop_first(self):
+        """Retire et retourne (jeu cible, données) de la prédiction la plus proche."""
+        target_game = self.first()
+        if target_game is None:
+            raise KeyError('file vide')
+        heapq.heappop(self._heap)
+        return target_game, self.pop(target_game)
+
+    def clear(self):
+        super().clear()
+        self._heap.clear()
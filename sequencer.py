@@ -0,0 +1,156 @@
+"""
+Mise en ordre des jeux finalisés avant leur traitement.
+
+Les handlers Telethon (nouveaux messages et éditions) tournent en parallèle
+et un jeu N peut être finalisé après N+1. Le séquenceur transmet les jeux de
+chaque canal source dans l'ordre des numéros, un seul à la fois (verrou),
+ce qui garantit la règle de paire N/N+1 et l'état des prédictions. Un jeu en
+avance attend dans un petit tampon que le précédent arrive ; passé
+`timeout`, le trou est ignoré et les jeux suivants sont traités. Les envois
+Telegram restent concurrents (file sortante) : seules les transitions d'état
+sont sérialisées.
+
+Un numéro inférieur au suivant attendu est un jeu en retard, sauf s'il
+arrive dans un message plus récent que tous ceux déjà vus (identifiants
+Telegram croissants dans un canal) et qu'il vaut #1 ou recule de plus de
+`reset_gap` : c'est alors un nouveau cycle du compteur de la source, seul cas
+où un numéro inférieur au dernier jeu traité est transmis (les tables y
+reconnaissent le retour du compteur, voir PredictionTable.rollover).
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GameSequencer:
+    """Transmet à `process(source, game_number, payload)` les jeux de chaque source dans l'ordre."""
+
+    def __init__(self, process, timeout: float = 3.0, reset_gap: int = 100):
+        self.process = process
+        self.timeout = timeout
+        # Écart au-delà duquel un numéro inattendu ouvre une nouvelle séquence (reprise, nouveau cycle)
+        self.reset_gap = reset_gap
+        self._expected = {}
+        # Identifiant du message le plus récent vu par source
+        self._last_message = {}
+        self._buffers = {}
+        self._timers = {}
+        self._lock = asyncio.Lock()
+        self.stats = {'in_order': 0, 'reordered': 0, 'late': 0, 'timeouts': 0, 'skipped_games': 0,
+                      'resets': 0, 'max_buffer': 0}
+
+    def restore(self, source: int, last_game: int, last_message_id: int = 0):
+        """Dernier jeu traité pour `source` (état restauré) : le suivant attendu est last_game + 1."""
+        if last_game:
+            self._expected[source] = last_game + 1
+        if last_message_id:
+            self._last_message[source] = last_message_id
+
+    def buffered(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    async def submit(self, source: int, game_number: int, payload, message_id: int = 0):
+        """`message_id` : identifiant Telegram du message du jeu (0 si inconnu, considéré comme le plus récent)."""
+        async with self._lock:
+            last_message = self._last_message.get(source, 0)
+            newest = not message_id or message_id > last_message
+            if message_id > last_message:
+                self._last_message[source] = message_id
+
+            expected = self._expected.get(source)
+            late = False
+            if expected is not None and game_number != expected:
+                distance = game_number - expected
+                if newest and (distance < -self.reset_gap or (game_number == 1 and distance < -1)):
+                    # Nouveau cycle : les jeux de l'ancien en attente passent, puis on attend #1
+                    # (un jeu du début du cycle finalisé avant #1 patiente dans le tampon)
+                    logger.info("🔢 Nouveau cycle sur %s: jeu #%s après #%s", source, game_number, expected - 1)
+                    self.stats['resets'] += 1
+                    await self._flush(source)
+                    self._expected[source] = expected = 1
+                    distance = game_number - 1
+                if distance > self.reset_gap:
+                    if not newest:
+                        # Message antérieur au début du cycle en cours : jeu de l'ancien cycle
+                        late = True
+                    else:
+                        # Reprise loin en avant : on n'attend pas les numéros intermédiaires
+                        logger.info("🔢 Nouvelle séquence sur %s: jeu #%s (attendu #%s)", source, game_number, expected)
+                        self.stats['resets'] += 1
+                        await self._flush(source)
+                        await self._release(source, game_number, payload)
+                        return
+
+            if not late and (expected is None or game_number == expected):
+                self.stats['in_order'] += 1
+                await self._release(source, game_number, payload)
+                await self._drain(source)
+                return
+
+            if late or game_number < expected:
+                self.stats['late'] += 1
+                logger.warning("⚠️ Jeu #%s reçu après #%s sur %s, ignoré", game_number, expected - 1, source)
+                return
+
+            buffer = self._buffers.setdefault(source, {})
+            buffer[game_number] = payload
+            self.stats['max_buffer'] = max(self.stats['max_buffer'], len(buffer))
+            if source not in self._timers:
+                self._timers[source] = asyncio.get_running_loop().create_task(self._expire(source))
+
+    async def flush(self, source: int = None):
+        """Traite immédiatement les jeux en attente (fin de rattrapage, arrêt, replay)."""
+        async with self._lock:
+            for src in ([source] if source is not None else list(self._buffers)):
+                await self._flush(src)
+
+    # --- Interne (verrou tenu) ---
+
+    async def _release(self, source: int, game_number: int, payload):
+        self._expected[source] = game_number + 1
+        await self.process(source, game_number, payload)
+
+    async def _drain(self, source: int):
+        buffer = self._buffers.get(source)
+        while buffer and self._expected[source] in buffer:
+            game_number = self._expected[source]
+            self.stats['reordered'] += 1
+            await self._release(source, game_number, buffer.pop(game_number))
+        if not buffer:
+            self._cancel_timer(source)
+
+    async def _flush(self, source: int):
+        buffer = self._buffers.get(source)
+        while buffer:
+            await self._skip_to_next(source)
+        self._cancel_timer(source)
+
+    async def _skip_to_next(self, source: int):
+        buffer = self._buffers[source]
+        game_number = min(buffer)
+        self.stats['skipped_games'] += game_number - self._expected[source]
+        await self._release(source, game_number, buffer.pop(game_number))
+        await self._drain(source)
+
+    async def _expire(self, source: int):
+        try:
+            while True:
+                await asyncio.sleep(self.timeout)
+                async with self._lock:
+                    buffer = self._buffers.get(source)
+                    if not buffer:
+                        break
+                    self.stats['timeouts'] += 1
+                    logger.warning("⏳ Jeu #%s non reçu sur %s après %ss, ignoré", self._expected[source], source, self.timeout)
+                    await self._skip_to_next(source)
+                    if not self._buffers.get(source):
+                        break
+        finally:
+            if self._timers.get(source) is asyncio.current_task():
+                del self._timers[source]
+
+    def _cancel_timer(self, source: int):
+        timer = self._timers.pop(source, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
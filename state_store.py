@@ -0,0 +1,194 @@
+"""
+Persistance de l'état du bot dans SQLite (mode WAL).
+
+Le chemin critique ne fait qu'enfiler des opérations (put/delete/clear) :
+un thread d'écriture les applique par lots dans une seule transaction, hors
+de la boucle asyncio. Si une opération échoue, le lot annulé est rejoué une
+opération à la fois : seule l'opération fautive est perdue. Au démarrage,
+`open()` relit tout l'état en une requête.
+
+L'historique (jeux finalisés et prédictions terminées) est ajouté par le même
+thread dans des tables en ajout seul, jamais relues au démarrage ni effacées
+par le reset quotidien ; elles servent aux exports (/export).
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+HISTORY_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS games ("
+    "table_name TEXT NOT NULL, game_number INTEGER NOT NULL, first_group TEXT NOT NULL, "
+    "suits INTEGER NOT NULL, recorded_at TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS predictions ("
+    "table_name TEXT NOT NULL, target_game INTEGER NOT NULL, suit INTEGER NOT NULL, "
+    "base_game INTEGER, status TEXT NOT NULL, created_at TEXT, resolved_at TEXT NOT NULL)",
+)
+
+# Colonnes des tables d'historique, dans l'ordre d'insertion et d'export
+HISTORY_COLUMNS = {
+    'games': ('table_name', 'game_number', 'first_group', 'suits', 'recorded_at'),
+    'predictions': ('table_name', 'target_game', 'suit', 'base_game', 'status', 'created_at', 'resolved_at'),
+}
+
+_HISTORY_INSERTS = {
+    name: f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    for name, columns in HISTORY_COLUMNS.items()
+}
+
+
+def read_value(path: str, ns: str, key):
+    """Lecture directe d'une valeur, sans démarrer le stockage (ex. avant la création du client)."""
+    if not path:
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+    try:
+        row = conn.execute("SELECT value FROM state WHERE ns = ? AND key = ?", (ns, str(key))).fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+
+class StateStore:
+    """Stockage clé/valeur par espace de noms (`ns`), écrit en arrière-plan."""
+
+    def __init__(self, path: str, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        self.enabled = False
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        # errors : opérations ignorées ; retried_batches : lots rejoués une opération à la fois
+        self.stats = {'writes': 0, 'batches': 0, 'errors': 0, 'retried_batches': 0}
+
+    def open(self) -> dict:
+        """Crée la base si besoin, démarre le thread d'écriture et retourne l'état {ns: {key: value}}."""
+        if not self.path:
+            return {}
+
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "ns TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (ns, key)) WITHOUT ROWID"
+            )
+            for statement in HISTORY_SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            snapshot = {}
+            for ns, key, value in conn.execute("SELECT ns, key, value FROM state"):
+                snapshot.setdefault(ns, {})[key] = json.loads(value)
+        finally:
+            conn.close()
+
+        self.enabled = True
+        self._thread = threading.Thread(target=self._writer, name='state-store', daemon=True)
+        self._thread.start()
+        return snapshot
+
+    # --- Enfilage (appelé depuis la boucle asyncio, jamais bloquant) ---
+
+    def put(self, ns: str, key, value):
+        if self.enabled:
+            # Copie superficielle : l'appelant peut continuer à modifier son dict
+            self._queue.put(('put', ns, str(key), dict(value) if isinstance(value, dict) else value))
+
+    def delete(self, ns: str, key):
+        if self.enabled:
+            self._queue.put(('delete', ns, str(key), None))
+
+    def clear(self, ns: str = None):
+        if self.enabled:
+            self._queue.put(('clear', ns, None, None))
+
+    def append(self, history: str, row: tuple):
+        """Ajoute une ligne à une table d'historique (voir HISTORY_COLUMNS)."""
+        if self.enabled:
+            self._queue.put(('append', history, None, row))
+
+    def backlog(self) -> int:
+        """Écritures en attente du thread d'écriture."""
+        return self._queue.qsize()
+
+    def close(self, timeout: float = 5.0):
+        """Vide la file d'écriture puis arrête le thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+        self.enabled = False
+
+    # --- Thread d'écriture ---
+
+    def _writer(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if _STOP in batch:
+                stopping = True
+                batch = [op for op in batch if op is not _STOP]
+
+            try:
+                with conn:
+                    for entry in batch:
+                        self._apply(conn, *entry)
+                self.stats['writes'] += len(batch)
+            except Exception as e:
+                # Lot annulé : rejoué une opération à la fois pour ne perdre que celles en échec
+                self.stats['retried_batches'] += 1
+                self._apply_each(conn, batch, e)
+            self.stats['batches'] += 1
+        conn.close()
+
+    def _apply_each(self, conn, batch: list, batch_error: Exception):
+        failed = []
+        for entry in batch:
+            try:
+                with conn:
+                    self._apply(conn, *entry)
+                self.stats['writes'] += 1
+            except Exception as e:
+                failed.append((entry, e))
+        self.stats['errors'] += len(failed)
+        if failed:
+            (op, ns, key, _), error = failed[0]
+            logger.error("❌ Erreur écriture de l'état: %s/%s opérations ignorées (première: %s %s/%s: %s)",
+                         len(failed), len(batch), op, ns, key, error)
+        else:
+            logger.warning("⚠️ Lot de %s écritures rejoué une par une après une erreur: %s", len(batch), batch_error)
+
+    @staticmethod
+    def _apply(conn, op: str, ns, key, value):
+        if op == 'put':
+            conn.execute(
+                "INSERT OR REPLACE INTO state (ns, key, value) VALUES (?, ?, ?)",
+                (ns, key, json.dumps(value, ensure_ascii=False)),
+            )
+        elif op == 'delete':
+            conn.execute("DELETE FROM state WHERE ns = ? AND key = ?", (ns, key))
+        elif op == 'append':
+            conn.execute(_HISTORY_INSERTS[ns], value)
+        elif ns is None:
+            conn.execute("DELETE FROM state")
+        else:
+            conn.execute("DELETE FROM state WHERE ns = ?", (ns,))
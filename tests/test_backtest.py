@@ -0,0 +1,21 @@
+"""Chargement de l'historique du backtest."""
+import json
+
+from backtest import load_history
+
+
+def test_log_spanning_counter_rollover_keeps_every_cycle(tmp_path):
+    path = tmp_path / 'messages.jsonl'
+    rows = []
+    message_id = 1
+    for cycle_length in (5, 3):
+        for game in range(1, cycle_length + 1):
+            rows.append({'id': message_id, 'text': f'#N{game}. ✅3(A♠️2♥️) - 2(3♦️4♣️) #T5', 'edited': True})
+            message_id += 1
+    # Édition tardive d'un message déjà finalisé : ignorée
+    rows.append({'id': 2, 'text': '#N2. ✅3(A♦️) - 2(3♦️) #T5', 'edited': True})
+    path.write_text('\n'.join(json.dumps(row, ensure_ascii=False) for row in rows), encoding='utf-8')
+
+    games = load_history(str(path))
+
+    assert sorted(games) == list(range(1, 9))
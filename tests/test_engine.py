@@ -0,0 +1,122 @@
+"""Cycle de vie des prédictions d'une table : retour du compteur et expiration."""
+import asyncio
+
+from config import SUIT_BITS
+from engine import PairRuleStrategy, PredictionTable
+from records import PredictionRecord
+
+SPADE, HEART = SUIT_BITS['♠'], SUIT_BITS['♥']
+
+
+class FakeOutbound:
+    def __init__(self):
+        self.message_ids = {}
+        self.sent = []
+        self.edits = []
+
+    def send_message(self, chat_id, text, key=None, on_sent=None):
+        self.sent.append(text)
+        if on_sent is not None:
+            on_sent(len(self.sent))
+
+    def edit_message(self, chat_id, key, text, message_id=None):
+        self.edits.append((message_id, text))
+
+
+class FakeStore:
+    def __init__(self):
+        self.history = []
+
+    def put(self, namespace, key, value):
+        pass
+
+    def delete(self, namespace, key):
+        pass
+
+    def clear(self, namespace):
+        pass
+
+    def append(self, table, row):
+        self.history.append((table, row))
+
+
+def make_table(current_game: int, **kwargs) -> PredictionTable:
+    table = PredictionTable('test', -1, -2, PairRuleStrategy(), FakeOutbound(), FakeStore(), **kwargs)
+    table.prediction_channel_ok = True
+    table.current_game_number = current_game
+    return table
+
+
+def play(table, *games):
+    async def run():
+        for game_number, mask in games:
+            await table.process_game(game_number, 'x', mask)
+    asyncio.run(run())
+
+
+def test_rollover_to_game_1_renumbers_and_keeps_published_number():
+    table = make_table(300)
+    asyncio.run(table.send_prediction_to_channel(302, HEART, 293))
+    table.queue_prediction(306, SPADE, 297)
+
+    play(table, (1, SPADE))
+
+    assert table.lifecycle['rollovers'] == 1
+    assert list(table.pending_predictions) == [2]
+    assert table.pending_predictions[2].display_game == 302
+    # Pas encore publiée : elle le sera sous son numéro du nouveau cycle
+    assert table.queued_predictions[6].display_game == 6
+
+    play(table, (2, HEART))
+
+    assert not table.pending_predictions
+    assert table.outbound.edits[-1] == (1, "😼 302😺: √♥ statut :✅0️⃣")
+    assert table.recent_outcomes.latest()[-1]['game'] == 302
+
+
+def test_new_cycle_after_missed_games_expires_predictions():
+    table = make_table(300)
+    asyncio.run(table.send_prediction_to_channel(302, HEART, 293))
+    table.queue_prediction(306, SPADE, 297)
+
+    play(table, (5, SPADE))
+
+    assert table.lifecycle['rollovers'] == 1
+    assert table.lifecycle['expired_predictions'] == 1
+    assert not table.pending_predictions
+    assert not table.queued_predictions
+    assert table.outbound.edits == [(1, "😼 302😺: √♥ statut :⌛")]
+    assert [row[1] for _, row in table.store.history if row[4] == 'supprimée'] == [302, 306]
+
+
+def test_prediction_without_result_expires_after_game_window():
+    table = make_table(9, game_window=10)
+    asyncio.run(table.send_prediction_to_channel(12, HEART, 3))
+
+    play(table, *((game, SPADE) for game in range(14, 23)))
+    assert 12 in table.pending_predictions
+
+    play(table, (23, SPADE))
+    assert 12 not in table.pending_predictions
+    assert table.lifecycle['expired_predictions'] == 1
+    assert table.lifecycle['rollovers'] == 0
+
+
+def test_display_number_survives_persistence():
+    pred = PredictionRecord(2, HEART, -7, display_game=302, status='🔮')
+    restored = PredictionRecord.from_dict(2, pred.to_dict())
+    assert (restored.target_game, restored.display_game) == (2, 302)
+    # Ancien format, sans numéro publié
+    assert PredictionRecord.from_dict(12, {'suit': HEART}).display_game == 12
+
+
+def test_reset_clears_outcomes_and_rolling_stats():
+    table = make_table(300)
+    asyncio.run(table.send_prediction_to_channel(302, HEART, 293))
+    play(table, (301, SPADE), (302, HEART))
+    assert len(table.recent_outcomes) == 1
+
+    table.reset()
+
+    assert len(table.recent_outcomes) == 0
+    assert all(summary['games'] == 0 for _, summary in table.rolling.summaries())
@@ -0,0 +1,94 @@
+"""Mise en ordre des jeux par GameSequencer."""
+import asyncio
+
+from sequencer import GameSequencer
+
+
+def run_sequence(submissions, timeout=3.0, reset_gap=100, last_game=0, last_message_id=0):
+    """Soumet (numéro, identifiant de message) à un séquenceur neuf ; retourne les numéros transmis et ses statistiques."""
+    released = []
+
+    async def process(source, game_number, payload):
+        released.append(game_number)
+
+    async def run():
+        sequencer = GameSequencer(process, timeout=timeout, reset_gap=reset_gap)
+        sequencer.restore(1, last_game, last_message_id)
+        for game_number, message_id in submissions:
+            await sequencer.submit(1, game_number, None, message_id)
+        await sequencer.flush()
+        return sequencer.stats
+
+    return released, asyncio.run(run())
+
+
+def test_new_cycle_from_game_1_in_newer_message():
+    released, stats = run_sequence([(299, 299), (300, 300), (1, 301), (2, 302)])
+    assert released == [299, 300, 1, 2]
+    assert stats['resets'] == 1
+
+
+def test_game_1_in_older_message_is_late():
+    released, stats = run_sequence([(299, 1299), (300, 1300), (1, 1001)])
+    assert released == [299, 300]
+    assert stats['late'] == 1
+
+
+def test_game_of_previous_cycle_after_new_cycle_is_late():
+    released, stats = run_sequence([(300, 300), (1, 302), (299, 299), (2, 303)])
+    assert released == [300, 1, 2]
+    assert stats['late'] == 1
+
+
+def test_new_cycle_waits_for_game_1():
+    released, _ = run_sequence([(300, 300), (2, 302), (1, 301)])
+    assert released == [300, 1, 2]
+
+
+def test_games_finalized_out_of_order_are_reordered():
+    released, stats = run_sequence([(10, 10), (12, 12), (11, 11), (13, 13)])
+    assert released == [10, 11, 12, 13]
+    assert stats['reordered'] == 1
+    assert stats['max_buffer'] == 1
+
+
+def test_missing_game_is_skipped_after_timeout():
+    released = []
+
+    async def process(source, game_number, payload):
+        released.append(game_number)
+
+    async def run():
+        sequencer = GameSequencer(process, timeout=0.01)
+        await sequencer.submit(1, 10, None)
+        await sequencer.submit(1, 12, None)
+        await sequencer.submit(1, 13, None)
+        assert released == [10]
+        await asyncio.sleep(0.05)
+        return sequencer
+
+    sequencer = asyncio.run(run())
+    assert released == [10, 12, 13]
+    assert sequencer.stats['timeouts'] == 1
+    assert sequencer.stats['skipped_games'] == 1
+    assert sequencer.buffered() == 0
+
+
+def test_game_after_its_successor_is_late():
+    released, stats = run_sequence([(10, 10), (11, 11), (10, 12)])
+    assert released == [10, 11]
+    assert stats['late'] == 1
+
+
+def test_jump_beyond_reset_gap_does_not_wait():
+    released, stats = run_sequence([(10, 10), (12, 11), (500, 12), (501, 13)], reset_gap=100)
+    # Le jeu en attente passe avant la nouvelle séquence, #11 n'est plus attendu
+    assert released == [10, 12, 500, 501]
+    assert stats['resets'] == 1
+    assert stats['skipped_games'] == 1
+
+
+def test_restored_state_expects_next_game():
+    released, stats = run_sequence([(299, 1299), (301, 1301), (300, 1300)], last_game=298, last_message_id=1298)
+    assert released == [299, 300, 301]
+    assert stats['late'] == 0